@@ -11,13 +11,16 @@ from datetime import datetime
 from typing import Optional, get_type_hints, get_origin, get_args
 from contextlib import closing
 
+import numpy as np
 from tornado.ioloop import IOLoop
 from bokeh.server.server import Server
 
 from domain.entity import LIDER
 from infrastructure.opcua_connector import OpcUaConnector
 from infrastructure.memory_history_repo import MemoryHistoryRepo
-from application.use_cases.monitor import monitor_subscription, monitor_polling
+from infrastructure.numpy_history_repo import NumpyHistoryRepo
+from infrastructure.file_history_repo import FileHistoryRepo
+from application.use_cases.monitor import monitor_subscription, monitor_polling, SubscriptionGroup, PollingStats
 from application.use_cases.controls import (
     serv_fixed, serv_random, change_fix_val, update_time, serv_out_of_range, method_cmd
 )
@@ -29,6 +32,7 @@ from domain.set_cmd_mode import (
     set_laser_enable, set_hv_enable, set_laser_prf
 )
 from presentation.bokeh_app import make_bokeh_app
+from presentation.render_cache import RenderCache
 
 
 # ===== Config =====
@@ -66,6 +70,15 @@ def get_graphable_attrs(all_attrs: list) -> list:
     
     return graphable_attrs
 
+
+def get_profile_attrs(all_attrs: list) -> list:
+    """
+    Filters variables published as profiles (Float[]/Double[], one value per range bin),
+    typed np.ndarray in LIDER.
+    """
+    type_hints = get_type_hints(LIDER)
+    return [attr_name for attr_name in all_attrs if np.ndarray in get_args(type_hints.get(attr_name.lower()))]
+
 def put_in_background():
     """
     Puts the process in background by redirecting stdin to free the terminal.
@@ -105,138 +118,211 @@ def put_in_background():
     
     return pid
 
-# domain_attr -> nodeid
-ATTR_MAP = {
+# section -> domain_attr -> nodeid
+ATTR_SECTIONS = {
     # --- Basic Status & Info ---
-    "STATE": "ns=2;s=lidar_get_state",
-    "STATUS": "ns=2;s=lidar_get_status",
-    "APP_NAME": "ns=2;s=lidar_get_serverApplicationName",
-    "OPCUA_PORT": "ns=2;s=lidar_get_opcuaPort",
-    "WEB_PORT": "ns=2;s=lidar_get_webPort",
-    "APP_START_TIME": "ns=2;s=lidar_get_startTime",
-    "SERIAL_NUMBER": "ns=2;s=lidar_get_serialNumber",
-    "TABLE_FILE_NAME": "ns=2;s=lidar_get_fileNameTable",
-    "PROSYS_SDK_VERSION": "ns=2;s=lidar_get_sdkversion",
-    "CURRENT_SESSION_NUMBER": "ns=2;s=lidar_get_currentsessionnumber",
-    "SESSIONS_NAME": "ns=2;s=lidar_get_sessionsname",
-    "RANDOM_GENERATOR_CODE": "ns=2;s=lidar_get_randomgeneratorcode",
-    "VERBOSE_STATUS": "ns=2;s=lidar_get_verbosestatus",
-    "UPDATETIME": "ns=2;s=lidar_get_updatetime",
-    "ISOTSTAMP": "ns=2;s=lidar_get_isotstamp",
-    "HEARTBEAT": "ns=2;s=heartbeat",
+    "basic_status": {
+        "STATE": "ns=2;s=lidar_get_state",
+        "STATUS": "ns=2;s=lidar_get_status",
+        "APP_NAME": "ns=2;s=lidar_get_serverApplicationName",
+        "OPCUA_PORT": "ns=2;s=lidar_get_opcuaPort",
+        "WEB_PORT": "ns=2;s=lidar_get_webPort",
+        "APP_START_TIME": "ns=2;s=lidar_get_startTime",
+        "SERIAL_NUMBER": "ns=2;s=lidar_get_serialNumber",
+        "TABLE_FILE_NAME": "ns=2;s=lidar_get_fileNameTable",
+        "PROSYS_SDK_VERSION": "ns=2;s=lidar_get_sdkversion",
+        "CURRENT_SESSION_NUMBER": "ns=2;s=lidar_get_currentsessionnumber",
+        "SESSIONS_NAME": "ns=2;s=lidar_get_sessionsname",
+        "RANDOM_GENERATOR_CODE": "ns=2;s=lidar_get_randomgeneratorcode",
+        "VERBOSE_STATUS": "ns=2;s=lidar_get_verbosestatus",
+        "UPDATETIME": "ns=2;s=lidar_get_updatetime",
+        "ISOTSTAMP": "ns=2;s=lidar_get_isotstamp",
+        "HEARTBEAT": "ns=2;s=heartbeat",
+    },
 
     # --- Errors ---
-    "ERROR_NUMBER": "ns=2;s=lidar_get_error_number",
-    "ERROR_INFORMATION": "ns=2;s=lidar_get_error_information",
-    "ERROR_RECOVERING": "ns=2;s=lidar_get_error_recovering",
-    "ERROR_NUMBER_RECOVERED": "ns=2;s=lidar_get_error_number_recovered",
-    "ERROR_NUMBER_OUTOFRANGE": "ns=2;s=lidar_get_error_number_outofrange",
+    "errors": {
+        "ERROR_NUMBER": "ns=2;s=lidar_get_error_number",
+        "ERROR_INFORMATION": "ns=2;s=lidar_get_error_information",
+        "ERROR_RECOVERING": "ns=2;s=lidar_get_error_recovering",
+        "ERROR_NUMBER_RECOVERED": "ns=2;s=lidar_get_error_number_recovered",
+        "ERROR_NUMBER_OUTOFRANGE": "ns=2;s=lidar_get_error_number_outofrange",
+    },
 
     # --- Raw Channels ---
-    "ELASTIC_CHANNEL_355_NM": "ns=2;s=lidar_get_ElasticChannel355Nm",
-    "ELASTIC_CHANNEL_532_NM": "ns=2;s=lidar_get_ElasticChannel532Nm",
-    "ELASTIC_CHANNEL_1064_NM": "ns=2;s=lidar_get_ElasticChannel1064Nm",
-    "RAMAN_CHANNEL_N2_387_NM": "ns=2;s=lidar_get_RamanChannelN2387Nm",
-    "RAMAN_CHANNEL_H2O": "ns=2;s=lidar_get_RamanChannelH2o",
-    "RAMAN_RANGE_SIGNAL_COUNTS": "ns=2;s=lidar_get_RamanRangeSignalCounts",
-    "STATISTICAL_ERROR_PER_BIN": "ns=2;s=lidar_get_StatisticalErrorPerBin",
-    "INTEGRATION_TIME": "ns=2;s=lidar_get_IntegrationTime",
-    "CO_POLAR_355_NM": "ns=2;s=lidar_get_CoPolar355Nm",
-    "CROSS_POLAR_355_NM": "ns=2;s=lidar_get_CrossPolar355Nm",
-    "CO_POLAR_532_NM": "ns=2;s=lidar_get_CoPolar532Nm",
-    "CROSS_POLAR_532_NM": "ns=2;s=lidar_get_CrossPolar532Nm",
-    "DEPOLARISATION_RATIO_PROFILE": "ns=2;s=lidar_get_DepolarisationRatioProfile",
+    "raw_channels": {
+        "ELASTIC_CHANNEL_355_NM": "ns=2;s=lidar_get_ElasticChannel355Nm",
+        "ELASTIC_CHANNEL_532_NM": "ns=2;s=lidar_get_ElasticChannel532Nm",
+        "ELASTIC_CHANNEL_1064_NM": "ns=2;s=lidar_get_ElasticChannel1064Nm",
+        "RAMAN_CHANNEL_N2_387_NM": "ns=2;s=lidar_get_RamanChannelN2387Nm",
+        "RAMAN_CHANNEL_H2O": "ns=2;s=lidar_get_RamanChannelH2o",
+        "RAMAN_RANGE_SIGNAL_COUNTS": "ns=2;s=lidar_get_RamanRangeSignalCounts",
+        "STATISTICAL_ERROR_PER_BIN": "ns=2;s=lidar_get_StatisticalErrorPerBin",
+        "INTEGRATION_TIME": "ns=2;s=lidar_get_IntegrationTime",
+        "CO_POLAR_355_NM": "ns=2;s=lidar_get_CoPolar355Nm",
+        "CROSS_POLAR_355_NM": "ns=2;s=lidar_get_CrossPolar355Nm",
+        "CO_POLAR_532_NM": "ns=2;s=lidar_get_CoPolar532Nm",
+        "CROSS_POLAR_532_NM": "ns=2;s=lidar_get_CrossPolar532Nm",
+        "DEPOLARISATION_RATIO_PROFILE": "ns=2;s=lidar_get_DepolarisationRatioProfile",
+    },
 
     # --- Derived Parameters ---
-    "BACKSCATTER_COEFFICIENT_BETA_Z": "ns=2;s=lidar_get_BackscatterCoefficientBetaZ",
-    "EXTINCTION_COEFFICIENT_ALPHA_Z": "ns=2;s=lidar_get_ExtinctionCoefficientAlphaZ",
-    "AEROSOL_OPTICAL_DEPTH": "ns=2;s=lidar_get_AerosolOpticalDepth",
-    "LIDAR_RATIO_S_Z": "ns=2;s=lidar_get_LidarRatioSZ",
-    "HUMIDITY_PROFILE_H2O": "ns=2;s=lidar_get_HumidityProfileH2o",
-    "PBL_HEIGHT": "ns=2;s=lidar_get_PblHeight",
-    "CLOUD_BASE_HEIGHT": "ns=2;s=lidar_get_CloudBaseHeight",
-    "SNR_PER_BIN": "ns=2;s=lidar_get_SnrPerBin",
+    "derived_parameters": {
+        "BACKSCATTER_COEFFICIENT_BETA_Z": "ns=2;s=lidar_get_BackscatterCoefficientBetaZ",
+        "EXTINCTION_COEFFICIENT_ALPHA_Z": "ns=2;s=lidar_get_ExtinctionCoefficientAlphaZ",
+        "AEROSOL_OPTICAL_DEPTH": "ns=2;s=lidar_get_AerosolOpticalDepth",
+        "LIDAR_RATIO_S_Z": "ns=2;s=lidar_get_LidarRatioSZ",
+        "HUMIDITY_PROFILE_H2O": "ns=2;s=lidar_get_HumidityProfileH2o",
+        "PBL_HEIGHT": "ns=2;s=lidar_get_PblHeight",
+        "CLOUD_BASE_HEIGHT": "ns=2;s=lidar_get_CloudBaseHeight",
+        "SNR_PER_BIN": "ns=2;s=lidar_get_SnrPerBin",
+    },
 
     # --- Metadata & Quality Indicators ---
-    "TIMESTAMP_UTC": "ns=2;s=lidar_get_Timestamp_Utc",
-    "INTEGRATION_ACCUMULATION_TIME": "ns=2;s=lidar_get_IntegrationAccumulationTime",
-    "NUMBER_OF_ACCUMULATED_PULSES": "ns=2;s=lidar_get_NumberOfAccumulatedPulses",
-    "VERTICAL_RESOLUTION_BIN_SIZE": "ns=2;s=lidar_get_VerticalResolutionBinSize",
-    "TEMPORAL_RESOLUTION": "ns=2;s=lidar_get_TemporalResolution",
-    "GLOBAL_SNR": "ns=2;s=lidar_get_GlobalSnr",
-    "QUALITY_FLAGS": "ns=2;s=lidar_get_QualityFlags",
-    "INTERNAL_TEMPERATURES": "ns=2;s=lidar_get_InternalTemperatures",
-    "LASER_READINGS_ENERGY_VOLTAGE_PRF": "ns=2;s=lidar_get_LaserReadingsEnergyVoltagePrf",
+    "metadata_quality": {
+        "TIMESTAMP_UTC": "ns=2;s=lidar_get_Timestamp_Utc",
+        "INTEGRATION_ACCUMULATION_TIME": "ns=2;s=lidar_get_IntegrationAccumulationTime",
+        "NUMBER_OF_ACCUMULATED_PULSES": "ns=2;s=lidar_get_NumberOfAccumulatedPulses",
+        "VERTICAL_RESOLUTION_BIN_SIZE": "ns=2;s=lidar_get_VerticalResolutionBinSize",
+        "TEMPORAL_RESOLUTION": "ns=2;s=lidar_get_TemporalResolution",
+        "GLOBAL_SNR": "ns=2;s=lidar_get_GlobalSnr",
+        "QUALITY_FLAGS": "ns=2;s=lidar_get_QualityFlags",
+        "INTERNAL_TEMPERATURES": "ns=2;s=lidar_get_InternalTemperatures",
+        "LASER_READINGS_ENERGY_VOLTAGE_PRF": "ns=2;s=lidar_get_LaserReadingsEnergyVoltagePrf",
+    },
 
     # --- Pre-processed Products ---
-    "AOD_TIME_SERIES": "ns=2;s=lidar_get_AodTimeSeries",
-    "AVERAGED_INTERVAL_PROFILES": "ns=2;s=lidar_get_AveragedIntervalProfiles",
-    "NETCDF_ASCII_GRID_FILES": "ns=2;s=lidar_get_NetcdfAsciiGridFiles",
-    "RANGE_TIME_IMAGES": "ns=2;s=lidar_get_RangeTimeImages",
-    "ASH_CLOUD_AUTOMATIC_DETECTION": "ns=2;s=lidar_get_AshCloudAutomaticDetection",
+    "preprocessed_products": {
+        "AOD_TIME_SERIES": "ns=2;s=lidar_get_AodTimeSeries",
+        "AVERAGED_INTERVAL_PROFILES": "ns=2;s=lidar_get_AveragedIntervalProfiles",
+        "NETCDF_ASCII_GRID_FILES": "ns=2;s=lidar_get_NetcdfAsciiGridFiles",
+        "RANGE_TIME_IMAGES": "ns=2;s=lidar_get_RangeTimeImages",
+        "ASH_CLOUD_AUTOMATIC_DETECTION": "ns=2;s=lidar_get_AshCloudAutomaticDetection",
+    },
 
     # --- Pointing & Scanning (Type & Accuracy) ---
-    "MOTORISED_2_AXIS_MOUNT": "ns=2;s=lidar_get_Motorised2AxisMount",
-    "THREE_D_SCANNING_CAPABILITY": "ns=2;s=lidar_get_ThreeDScanningCapability",
-    "AZIMUTH_RANGE_0_360_DEG": "ns=2;s=lidar_get_AzimuthRange0360Deg",
-    "ELEVATION_RANGE_MINUS_5_90_DEG": "ns=2;s=lidar_get_ElevationRange_590Deg",
-    "POINTING_ACCURACY": "ns=2;s=lidar_get_PointingAccuracy",
-    "ANGULAR_SPEED_CONFIGURABLE": "ns=2;s=lidar_get_AngularSpeedConfigurable",
-    "MODE_STARE_FIXED": "ns=2;s=lidar_get_ModeStareFixed",
-    "MODE_RASTER_SCAN": "ns=2;s=lidar_get_ModeRasterScan",
-    "MODE_CONE_SCAN": "ns=2;s=lidar_get_ModeConeScan",
-    "MODE_VOLUME_SCAN": "ns=2;s=lidar_get_ModeVolumeScan",
-    "ANGULAR_STEP_PER_BIN": "ns=2;s=lidar_get_AngularStepPerBin",
-    "INTEGRATION_TIME_PER_POSITION": "ns=2;s=lidar_get_IntegrationTimePerPosition",
+    "pointing_scanning": {
+        "MOTORISED_2_AXIS_MOUNT": "ns=2;s=lidar_get_Motorised2AxisMount",
+        "THREE_D_SCANNING_CAPABILITY": "ns=2;s=lidar_get_ThreeDScanningCapability",
+        "AZIMUTH_RANGE_0_360_DEG": "ns=2;s=lidar_get_AzimuthRange0360Deg",
+        "ELEVATION_RANGE_MINUS_5_90_DEG": "ns=2;s=lidar_get_ElevationRange_590Deg",
+        "POINTING_ACCURACY": "ns=2;s=lidar_get_PointingAccuracy",
+        "ANGULAR_SPEED_CONFIGURABLE": "ns=2;s=lidar_get_AngularSpeedConfigurable",
+        "MODE_STARE_FIXED": "ns=2;s=lidar_get_ModeStareFixed",
+        "MODE_RASTER_SCAN": "ns=2;s=lidar_get_ModeRasterScan",
+        "MODE_CONE_SCAN": "ns=2;s=lidar_get_ModeConeScan",
+        "MODE_VOLUME_SCAN": "ns=2;s=lidar_get_ModeVolumeScan",
+        "ANGULAR_STEP_PER_BIN": "ns=2;s=lidar_get_AngularStepPerBin",
+        "INTEGRATION_TIME_PER_POSITION": "ns=2;s=lidar_get_IntegrationTimePerPosition",
+    },
 
     # --- Remote Control & Commands ---
-    "ETHERNET_API_GUI_CONTROL": "ns=2;s=lidar_get_EthernetApiGuiControl",
-    "CMD_SET_AZ": "ns=2;s=lidar_get_CmdSetAz",
-    "CMD_SET_EL": "ns=2;s=lidar_get_CmdSetEl",
-    "CMD_HOME": "ns=2;s=lidar_get_CmdHome",
-    "CMD_PARK": "ns=2;s=lidar_get_CmdPark",
-    "CMD_START_SCAN": "ns=2;s=lidar_get_CmdStartScan",
-    "TELEMETRY_STATUS_POSITION_ENCODER": "ns=2;s=lidar_get_TelemetryStatusPositionEncoder",
-    "COMMAND_LATENCY": "ns=2;s=lidar_get_CommandLatency",
-    "ENCODER_POSITION_CONFIRMATION": "ns=2;s=lidar_get_EncoderPositionConfirmation",
-    "DIRECT_POINTING_COMMANDS": "ns=2;s=lidar_get_DirectPointingCommands",
-    "POINTING_TOLERANCE": "ns=2;s=lidar_get_PointingTolerance",
-    "POINTING_VERIFICATION": "ns=2;s=lidar_get_PointingVerification",
-    "MEASUREMENT_STRATEGY_BY_POINTING": "ns=2;s=lidar_get_MeasurementStrategyByPointing",
-    "POSITION_QUALITY_FLAGS": "ns=2;s=lidar_get_PositionQualityFlags",
+    "remote_control": {
+        "ETHERNET_API_GUI_CONTROL": "ns=2;s=lidar_get_EthernetApiGuiControl",
+        "CMD_SET_AZ": "ns=2;s=lidar_get_CmdSetAz",
+        "CMD_SET_EL": "ns=2;s=lidar_get_CmdSetEl",
+        "CMD_HOME": "ns=2;s=lidar_get_CmdHome",
+        "CMD_PARK": "ns=2;s=lidar_get_CmdPark",
+        "CMD_START_SCAN": "ns=2;s=lidar_get_CmdStartScan",
+        "TELEMETRY_STATUS_POSITION_ENCODER": "ns=2;s=lidar_get_TelemetryStatusPositionEncoder",
+        "COMMAND_LATENCY": "ns=2;s=lidar_get_CommandLatency",
+        "ENCODER_POSITION_CONFIRMATION": "ns=2;s=lidar_get_EncoderPositionConfirmation",
+        "DIRECT_POINTING_COMMANDS": "ns=2;s=lidar_get_DirectPointingCommands",
+        "POINTING_TOLERANCE": "ns=2;s=lidar_get_PointingTolerance",
+        "POINTING_VERIFICATION": "ns=2;s=lidar_get_PointingVerification",
+        "MEASUREMENT_STRATEGY_BY_POINTING": "ns=2;s=lidar_get_MeasurementStrategyByPointing",
+        "POSITION_QUALITY_FLAGS": "ns=2;s=lidar_get_PositionQualityFlags",
+    },
 
     # --- Safety ---
-    "SAFETY_INTERLOCKS": "ns=2;s=lidar_get_SafetyInterlocks",
-    "NO_GO_ZONES": "ns=2;s=lidar_get_NoGoZones",
-    "HUMAN_PRESENCE_LOCKOUT": "ns=2;s=lidar_get_HumanPresenceLockout",
-    "DAY_NIGHT_MODES": "ns=2;s=lidar_get_DayNightModes",
+    "safety": {
+        "SAFETY_INTERLOCKS": "ns=2;s=lidar_get_SafetyInterlocks",
+        "NO_GO_ZONES": "ns=2;s=lidar_get_NoGoZones",
+        "HUMAN_PRESENCE_LOCKOUT": "ns=2;s=lidar_get_HumanPresenceLockout",
+        "DAY_NIGHT_MODES": "ns=2;s=lidar_get_DayNightModes",
+    },
 
     # --- Instrument Measurement State ---
-    "MEASUREMENT_TIME_UTC": "ns=2;s=lidar_get_MeasurementTimeUtc",
-    "INTEGRATION_SECONDS": "ns=2;s=lidar_get_IntegrationSeconds",
-    "LASER_WAVELENGTH_NM": "ns=2;s=lidar_get_LaserWavelengthNm",
-    "CHANNEL_ID": "ns=2;s=lidar_get_ChannelId",
-    "RANGE_M": "ns=2;s=lidar_get_RangeM",
-    "SIGNAL_COUNTS": "ns=2;s=lidar_get_SignalCounts",
-    "SIGNAL_ERROR": "ns=2;s=lidar_get_SignalError",
-    "BACKSCATTER_COEF_M_SR": "ns=2;s=lidar_get_BackscatterCoefMSr",
-    "EXTINCTION_COEF_KM_1": "ns=2;s=lidar_get_ExtinctionCoefKm1",
-    "DEPOLARIZATION_RATIO": "ns=2;s=lidar_get_DepolarizationRatio",
-    "WATER_VAPOUR_MIXING_RATIO_G_PER_KG": "ns=2;s=lidar_get_WaterVapourMixingRatioGPerKg",
-    "CLOUD_BASE_HEIGHT_M": "ns=2;s=lidar_get_CloudBaseHeightM",
-    "PBL_HEIGHT_M": "ns=2;s=lidar_get_PblHeightM",
-    "POINTING_AZ_DEG": "ns=2;s=lidar_get_PointingAzDeg",
-    "POINTING_EL_DEG": "ns=2;s=lidar_get_PointingElDeg",
-    "POINTING_TARGET_AZ_DEG": "ns=2;s=lidar_get_PointingTargetAzDeg",
-    "POINTING_TARGET_EL_DEG": "ns=2;s=lidar_get_PointingTargetElDeg",
-    "POINTING_STATUS": "ns=2;s=lidar_get_PointingStatus",
-    "POINTING_ACCURACY_DEG": "ns=2;s=lidar_get_PointingAccuracyDeg",
-    "SCAN_MODE": "ns=2;s=lidar_get_ScanMode",
-    "DEVICE_STATUS": "ns=2;s=lidar_get_DeviceStatus",
-    "FILE_FORMAT_VERSION": "ns=2;s=lidar_get_FileFormatVersion",
+    "measurement_state": {
+        "MEASUREMENT_TIME_UTC": "ns=2;s=lidar_get_MeasurementTimeUtc",
+        "INTEGRATION_SECONDS": "ns=2;s=lidar_get_IntegrationSeconds",
+        "LASER_WAVELENGTH_NM": "ns=2;s=lidar_get_LaserWavelengthNm",
+        "CHANNEL_ID": "ns=2;s=lidar_get_ChannelId",
+        "RANGE_M": "ns=2;s=lidar_get_RangeM",
+        "SIGNAL_COUNTS": "ns=2;s=lidar_get_SignalCounts",
+        "SIGNAL_ERROR": "ns=2;s=lidar_get_SignalError",
+        "BACKSCATTER_COEF_M_SR": "ns=2;s=lidar_get_BackscatterCoefMSr",
+        "EXTINCTION_COEF_KM_1": "ns=2;s=lidar_get_ExtinctionCoefKm1",
+        "DEPOLARIZATION_RATIO": "ns=2;s=lidar_get_DepolarizationRatio",
+        "WATER_VAPOUR_MIXING_RATIO_G_PER_KG": "ns=2;s=lidar_get_WaterVapourMixingRatioGPerKg",
+        "CLOUD_BASE_HEIGHT_M": "ns=2;s=lidar_get_CloudBaseHeightM",
+        "PBL_HEIGHT_M": "ns=2;s=lidar_get_PblHeightM",
+        "POINTING_AZ_DEG": "ns=2;s=lidar_get_PointingAzDeg",
+        "POINTING_EL_DEG": "ns=2;s=lidar_get_PointingElDeg",
+        "POINTING_TARGET_AZ_DEG": "ns=2;s=lidar_get_PointingTargetAzDeg",
+        "POINTING_TARGET_EL_DEG": "ns=2;s=lidar_get_PointingTargetElDeg",
+        "POINTING_STATUS": "ns=2;s=lidar_get_PointingStatus",
+        "POINTING_ACCURACY_DEG": "ns=2;s=lidar_get_PointingAccuracyDeg",
+        "SCAN_MODE": "ns=2;s=lidar_get_ScanMode",
+        "DEVICE_STATUS": "ns=2;s=lidar_get_DeviceStatus",
+        "FILE_FORMAT_VERSION": "ns=2;s=lidar_get_FileFormatVersion",
+    },
 }
 
+# domain_attr -> nodeid (flat view of ATTR_SECTIONS)
+ATTR_MAP = {attr: nid for section in ATTR_SECTIONS.values() for attr, nid in section.items()}
+
+# Channels published as one value per range bin: drawn as a range-time heatmap, not as lines
+PROFILE_ATTRS = get_profile_attrs(list(ATTR_MAP))
+
+# Values that only change on server restart: published rarely, no queueing
+STATIC_ATTRS = [
+    "APP_NAME", "OPCUA_PORT", "WEB_PORT", "APP_START_TIME", "SERIAL_NUMBER",
+    "TABLE_FILE_NAME", "PROSYS_SDK_VERSION", "FILE_FORMAT_VERSION",
+]
+
+# One OPC UA subscription per group (an attribute belongs to the first group listing it).
+# Anything not listed here goes to a "default" group published every 500 ms.
+SUBSCRIPTION_GROUPS = [
+    SubscriptionGroup("static", STATIC_ATTRS, publishing_interval_ms=10_000),
+    SubscriptionGroup(
+        "status",
+        list(ATTR_SECTIONS["basic_status"]) + list(ATTR_SECTIONS["errors"]) + list(ATTR_SECTIONS["safety"]),
+        publishing_interval_ms=500,
+    ),
+    SubscriptionGroup(
+        "channels",
+        list(ATTR_SECTIONS["raw_channels"]) + list(ATTR_SECTIONS["measurement_state"]),
+        publishing_interval_ms=250, sampling_interval_ms=100, queue_size=10,
+    ),
+    SubscriptionGroup(
+        "derived",
+        list(ATTR_SECTIONS["derived_parameters"]) + list(ATTR_SECTIONS["metadata_quality"])
+        + list(ATTR_SECTIONS["preprocessed_products"]),
+        publishing_interval_ms=1_000,
+    ),
+    SubscriptionGroup(
+        "pointing",
+        list(ATTR_SECTIONS["pointing_scanning"]) + list(ATTR_SECTIONS["remote_control"]),
+        publishing_interval_ms=500,
+    ),
+]
+
+# History retention, set once for all consumers: covers the longest Bokeh time window
+# (each view/query passes its own window to get_history instead of changing retention)
+HISTORY_RETENTION_MINUTES = 60
+HISTORY_MEMORY_BUDGET_MB = 256
+# On-disk history (--history file): directory of segment files and how long they are kept
+HISTORY_DIR = "history"
+HISTORY_FILE_RETENTION_MINUTES = 7 * 24 * 60
+# Compressed in-memory history (--history compressed): a day of every numeric channel
+HISTORY_COMPRESSED_RETENTION_MINUTES = 24 * 60
+
 # ===== Embedded Bokeh =====
+# How raw lines are thinned to MAX_POINTS: "minmax" (keeps every spike) or "lttb" (closest shape)
+BOKEH_DECIMATION = "minmax"
+# Plots redraw when their variables get new samples, at most once per this many seconds
+BOKEH_MIN_FRAME_SECONDS = 0.1
 _bokeh_started = False
 def start_bokeh(history_repo, preferred_port: int = 5010, auto_open: bool = False):
     def _get_local_ip() -> str:
@@ -279,9 +365,12 @@ def start_bokeh(history_repo, preferred_port: int = 5010, auto_open: bool = Fals
         if not graphable_attrs:
             # Fallback to heartbeat if no graphable variables
             graphable_attrs = ["HEARTBEAT"] if "HEARTBEAT" in ATTR_MAP else []
+        # one per server: sessions showing the same lines share their decimated data
+        render_cache = RenderCache(history_repo)
         
         server = Server(
-            {'/bokeh_app': lambda doc: make_bokeh_app(doc, history_repo, graphable_attrs)},
+            {'/bokeh_app': lambda doc: make_bokeh_app(doc, history_repo, graphable_attrs, BOKEH_DECIMATION,
+                                                          render_cache, BOKEH_MIN_FRAME_SECONDS, PROFILE_ATTRS)},
             io_loop=io_loop,
             address=host_ip,
             port=port,
@@ -335,9 +424,24 @@ def _auto_convert(s: str):
     return t
 
 # ===== Main loop =====
-async def run(opc_url: str, polling_rate_seconds: float | None = None, security_string: str = None):
+async def run(opc_url: str, polling_rate_seconds: float | None = None, security_string: str = None,
+              history_backend: str = "memory"):
     lider = LIDER()
-    history = MemoryHistoryRepo(retention_minutes=10)
+    # polling deadlines missed/skipped, kept across reconnects and logged by the connection check
+    polling_stats = PollingStats()
+    if history_backend == "file":
+        history = FileHistoryRepo(HISTORY_DIR, retention_minutes=HISTORY_FILE_RETENTION_MINUTES,
+                                  memory_retention_minutes=HISTORY_RETENTION_MINUTES,
+                                  memory_budget_mb=HISTORY_MEMORY_BUDGET_MB)
+    elif history_backend == "compressed":
+        history = MemoryHistoryRepo(retention_minutes=HISTORY_COMPRESSED_RETENTION_MINUTES,
+                                    memory_budget_mb=HISTORY_MEMORY_BUDGET_MB, compress=True)
+    elif history_backend == "numpy":
+        history = NumpyHistoryRepo(retention_minutes=HISTORY_RETENTION_MINUTES,
+                                   memory_budget_mb=HISTORY_MEMORY_BUDGET_MB)
+    else:
+        history = MemoryHistoryRepo(retention_minutes=HISTORY_RETENTION_MINUTES,
+                                    memory_budget_mb=HISTORY_MEMORY_BUDGET_MB)
     connector = None
     sub_task = None
     loop = asyncio.get_running_loop()
@@ -367,12 +471,15 @@ async def run(opc_url: str, polling_rate_seconds: float | None = None, security_
             if polling_rate_seconds is not None:
                 print(f"[Mode] POLLING for history/Bokeh @ {polling_rate_seconds} seconds")
                 sub_task = asyncio.create_task(
-                    monitor_polling(connector, ATTR_MAP, lider, history, interval_seconds=polling_rate_seconds)
+                    monitor_polling(connector, ATTR_MAP, lider, history, interval_seconds=polling_rate_seconds,
+                                    static_attrs=STATIC_ATTRS, stats=polling_stats)
                 )
             else:
-                print(f"[Mode] OPC UA SUBSCRIPTION for history/Bokeh (period_ms=500)")
+                groups = ", ".join(f"{g.name}={g.publishing_interval_ms:g}ms" for g in SUBSCRIPTION_GROUPS)
+                print(f"[Mode] OPC UA SUBSCRIPTION for history/Bokeh ({groups})")
                 sub_task = asyncio.create_task(
-                    monitor_subscription(connector, ATTR_MAP, lider, history, period_ms=500)
+                    monitor_subscription(connector, ATTR_MAP, lider, history, period_ms=500,
+                                         groups=SUBSCRIPTION_GROUPS)
                 )
             
             print(f"Connected to {opc_url}.")
@@ -384,6 +491,16 @@ async def run(opc_url: str, polling_rate_seconds: float | None = None, security_
     # Task to periodically verify connection
     connection_check_task = None
     stop_reconnect = False
+    missed_reported = 0
+
+    def report_polling_stats():
+        # logs deadlines missed since the last report (polling mode only)
+        nonlocal missed_reported
+        if polling_stats.missed_deadlines > missed_reported:
+            print(f"[polling] {polling_stats.missed_deadlines - missed_reported} missed deadline(s) "
+                  f"({polling_stats.skipped_ticks} ticks skipped, {polling_stats.ticks} reads in total; "
+                  f"last read took {polling_stats.last_read_seconds:.3f} s)")
+            missed_reported = polling_stats.missed_deadlines
     
     async def check_connection_periodically():
         nonlocal connected
@@ -393,6 +510,9 @@ async def run(opc_url: str, polling_rate_seconds: float | None = None, security_
                 try:
                     # Try a simple operation to verify connection
                     await connector.read_node(list(ATTR_MAP.values())[0])
+                    # A server restart can remap namespace indexes without dropping us: re-resolve nodes then
+                    await connector.refresh_namespaces()
+                    report_polling_stats()
                 except Exception:
                     # Connection lost
                     if connected:
@@ -554,6 +674,8 @@ async def run(opc_url: str, polling_rate_seconds: float | None = None, security_
                 await connector.disconnect()
             except Exception:
                 pass
+        if isinstance(history, FileHistoryRepo):
+            history.close()  # write out the samples still buffered
         print("Connection closed.")
 
 
@@ -593,6 +715,15 @@ if __name__ == "__main__":
         default="private_key.pem",
         help="Path to client private key file (default: private_key.pem)"
     )
+    parser.add_argument(
+        "--history",
+        choices=["memory", "numpy", "compressed", "file"],
+        default="memory",
+        help="History backend: 'memory' (per-sample records, keeps server timestamp/status), "
+             "'numpy' (columnar ring buffers, ~10x less memory), "
+             "'compressed' (compressed blocks, a few bytes/sample, 24 h retention) "
+             "or 'file' (persistent segment files in ./history, survives restarts)"
+    )
     
     args = parser.parse_args()
     
@@ -601,7 +732,8 @@ if __name__ == "__main__":
         security_string = f"Basic256Sha256,SignAndEncrypt,{args.cert},{args.key}"
     
     try:
-        asyncio.run(run(args.opc_url, polling_rate_seconds=args.RATE, security_string=security_string))
+        asyncio.run(run(args.opc_url, polling_rate_seconds=args.RATE, security_string=security_string,
+                        history_backend=args.history))
     except KeyboardInterrupt:
         print("\nProgram terminated by user.")
     except Exception as e:
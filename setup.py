@@ -4,13 +4,14 @@ setup(
     name="si3-opcua-client",
     version="0.1.0",
     description="Clean architecture OPC UA client for SI3 monitoring and history with Bokeh visualization",
-    python_requires=">=3.8",
+    python_requires=">=3.10",
     packages=find_packages(where="src"),
     package_dir={"": "src"},
     install_requires=[
         "asyncua",
         "bokeh",
         "tornado",
+        "numpy",
         "python-dotenv"
     ],
     entry_points={
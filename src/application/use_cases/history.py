@@ -2,6 +2,5 @@
 from datetime import datetime, timedelta
 
 def query_history(history_repo, attr: str, minutes: int = 10):
-    # adjust retention if necessary (optional)
-    history_repo.set_retention(minutes)
-    return history_repo.get_history(attr)
+    # query window only; it does not change the repo's retention (shared by all consumers)
+    return history_repo.get_history(attr, since=datetime.utcnow() - timedelta(minutes=minutes))
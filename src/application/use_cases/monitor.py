@@ -1,66 +1,246 @@
 # src/application/use_cases/monitor.py
 import asyncio
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Callable, List
+from typing import Dict, Callable, List, Optional, Sequence
+
+import numpy as np
+from asyncua import ua
+
+from infrastructure.epoch import EPOCH, EPOCH_UTC
+
+
+@dataclass
+class SubscriptionGroup:
+    """
+    A set of attributes (ATTR_MAP keys) served by their own OPC UA subscription.
+    sampling_interval_ms=-1 samples at the publishing interval. Deadbands
+    only apply to numeric nodes (percent needs an EURange on the server).
+    """
+    name: str
+    attrs: Sequence[str]
+    publishing_interval_ms: float = 500
+    sampling_interval_ms: float = -1
+    queue_size: int = 1
+    deadband_abs: Optional[float] = None
+    deadband_pct: Optional[float] = None
+
+
+def _utc_naive(ts):
+    # asyncua may return tz-aware timestamps; history stores naive UTC.
+    # (epoch arithmetic is ~15x cheaper than astimezone()/replace())
+    if ts is not None and ts.tzinfo is not None:
+        ts = EPOCH + (ts - EPOCH_UTC)
+    return ts
+
+
+# Float[]/Double[] variants (per-bin profiles) are converted once, at ingest, into
+# contiguous NumPy arrays; the entity, history and Bokeh then share that array
+_ARRAY_DTYPES = {ua.VariantType.Float: np.float32, ua.VariantType.Double: np.float64}
+
+
+def _as_array(val: list, variant):
+    dtype = _ARRAY_DTYPES.get(variant.VariantType) if variant is not None else None
+    return val if dtype is None else np.array(val, dtype=dtype)
+
+
+def _unpack(val, dv):
+    """
+    (value, source_ts, server_ts, status) of one sample, shared by the polling
+    and subscription paths; None when its status is bad.
+    dv is the OPC UA DataValue (or None); array values become NumPy arrays
+    and timestamps naive UTC.
+    """
+    if dv is None:
+        return val, None, None, None
+    status = dv.StatusCode
+    if status is not None and status.is_bad():
+        # Bad values don't overwrite the last known value
+        return None
+    if type(val) is list:
+        val = _as_array(val, dv.Value)
+    return val, _utc_naive(dv.SourceTimestamp), _utc_naive(dv.ServerTimestamp), status
+
+
+_DROPPED = object()  # _record result for samples with a bad status
+
+
+def _record(append, val, dv, received: datetime):
+    """
+    Applies one sample to the history through the attribute's appender
+    (history_repo.appender) and returns the value to set on the entity
+    (the caller batches entity updates). Timestamps fall back to
+    the client receive time. Returns _DROPPED when the sample was dropped
+    because of a bad status.
+    """
+    sample = _unpack(val, dv)
+    if sample is None:
+        return _DROPPED
+    val, source_ts, server_ts, status = sample
+    append(val, source_ts, server_ts, status, received)
+    return val
 
 class OpcSubscriptionHandler:
     def __init__(self, attr_map: Dict[str, str], si3_entity, history_repo):
         """
         attr_map: domain_attr -> node_id
+        The dispatch table is built once here: NodeId -> (entity attribute,
+        history appender). Notifications are then also cached by monitored-item
+        client handle, so the hot path is a single int-keyed dict lookup.
         """
         self.attr_map = attr_map
-        self.rev_map = {v: k for k, v in attr_map.items()}
         self.si3 = si3_entity
         self.history = history_repo
-
-    async def datachange_notification(self, node, val, data):
-        # asyncua may call this synchronously; allow both
-        nodeid = node.nodeid.to_string()
-        attr = self.rev_map.get(nodeid)
-        ts = datetime.utcnow()
-        if attr:
+        self._slots = {}
+        for attr, node_id in attr_map.items():
             # attribute names in entity should match attr_map keys (case-insensitive)
             attr_lower = attr.lower()
-            self.si3.set_attr(attr_lower, val)
-            self.history.append(attr, val, ts)
+            if attr_lower not in si3_entity.FIELD_INDEX:
+                print(f"[subscription] SI3 has no attribute {attr_lower}; {node_id} is ignored")
+                continue
+            self._slots[ua.NodeId.from_string(node_id)] = (attr_lower, history_repo.appender(attr))
+        self._by_handle = {}
 
-    # compatibility if called sync:
     def datachange_notification(self, node, val, data):
-        # wrapper to schedule async if needed
-        # For simple updates we can just run the logic directly if it doesn't await anything
-        # But since set_attr and history.append are sync, we can just duplicate logic or call a common method
-        nodeid = node.nodeid.to_string()
-        attr = self.rev_map.get(nodeid)
-        ts = datetime.utcnow()
-        if attr:
-            attr_lower = attr.lower()
-            self.si3.set_attr(attr_lower, val)
-            self.history.append(attr, val, ts)
+        # asyncua calls this synchronously; keep it free of awaits and parsing
+        mi = data.monitored_item
+        slot = self._by_handle.get(mi.ClientHandle)
+        if slot is None:
+            slot = self._slots.get(node.nodeid)
+            if slot is None:
+                return
+            self._by_handle[mi.ClientHandle] = slot
+        received = datetime.utcnow()
+        attr_lower, append = slot
+        sample = _unpack(val, mi.Value)
+        if sample is None:
+            return
+        setattr(self.si3, attr_lower, sample[0])
+        append(*sample, received)
 
 
-async def monitor_subscription(opc_connector, attr_map: Dict[str, str], si3, history_repo, period_ms=500):
+async def monitor_subscription(opc_connector, attr_map: Dict[str, str], si3, history_repo, period_ms=500,
+                               groups: Optional[Sequence[SubscriptionGroup]] = None):
+    """
+    Subscribes to every attr_map node. With groups, each group gets its own
+    subscription/sampling/queue/deadband; an attribute belongs to the first
+    group listing it, and attributes in no group go to a "default" group
+    published every period_ms.
+    """
     handler = OpcSubscriptionHandler(attr_map, si3, history_repo)
-    await opc_connector.create_subscription(period_ms, handler)
-    await opc_connector.subscribe_to_nodes(list(attr_map.values()))
+    assigned = set()
+    plan = []
+    for group in groups or []:
+        attrs = [a for a in group.attrs if a in attr_map and a not in assigned]
+        assigned.update(attrs)
+        if attrs:
+            plan.append((group, attrs))
+    rest = [a for a in attr_map if a not in assigned]
+    if rest:
+        plan.append((SubscriptionGroup("default", rest, publishing_interval_ms=period_ms), rest))
+
+    for group, attrs in plan:
+        await opc_connector.create_subscription(group.publishing_interval_ms, handler, name=group.name)
+        await opc_connector.subscribe_to_nodes(
+            [attr_map[a] for a in attrs],
+            subscription=group.name,
+            sampling_interval_ms=group.sampling_interval_ms,
+            queue_size=group.queue_size,
+            deadband_abs=group.deadband_abs,
+            deadband_pct=group.deadband_pct,
+        )
     # subscription runs until cancelled; keep coroutine alive
     while True:
         await asyncio.sleep(1.0)
         
-async def monitor_polling(opc_connector, attr_map: Dict[str, str], si3, history_repo, interval_seconds: float):
-    node_ids = list(attr_map.values())
-    attrs    = list(attr_map.keys())
-    delay    = max(0.001, float(interval_seconds))  # minimum 1ms, in seconds
+@dataclass
+class PollingStats:
+    ticks: int = 0              # bulk reads issued
+    missed_deadlines: int = 0   # ticks that started after their deadline
+    skipped_ticks: int = 0      # periods dropped to catch up under overload
+    last_read_seconds: float = 0.0
+
+
+async def monitor_polling(opc_connector, attr_map: Dict[str, str], si3, history_repo, interval_seconds: float,
+                          rates: Optional[Dict[str, float]] = None, static_attrs: Sequence[str] = (),
+                          stats: Optional[PollingStats] = None):
+    """
+    Fixed-rate polling on the monotonic clock: deadlines are start + k*period,
+    so read latency doesn't add to the period.
+    rates: attr -> period in seconds (default interval_seconds for all).
+    static_attrs: read until the first good value, then never again.
+    Attributes due in the same tick are merged into one bulk read. When a
+    tick starts late by more than a period, the missed periods are skipped
+    (and counted in stats) instead of being caught up back to back.
+    """
+    loop = asyncio.get_running_loop()
+    stats = stats if stats is not None else PollingStats()
+    default = max(0.001, float(interval_seconds))  # minimum 1ms, in seconds
+    rates = rates or {}
+    static = set(static_attrs)
+
+    # period -> attrs polled at that period; static attrs share a bucket (period None)
+    buckets: Dict[Optional[float], List[str]] = {}
+    # attr -> entity field position, so each read updates the entity in one call
+    index: Dict[str, int] = {}
+    # attr -> history appender, bound once (as OpcSubscriptionHandler does)
+    appenders: Dict[str, Callable[..., None]] = {}
+    for attr in attr_map:
+        if attr.lower() not in si3.FIELD_INDEX:
+            print(f"[polling] SI3 has no attribute {attr.lower()}; {attr_map[attr]} is ignored")
+            continue
+        index[attr] = si3.FIELD_INDEX[attr.lower()]
+        appenders[attr] = history_repo.appender(attr)
+        period = None if attr in static else max(0.001, float(rates.get(attr, default)))
+        buckets.setdefault(period, []).append(attr)
+    start = loop.time()
+    next_due = {period: start for period in buckets}
 
     while True:
-        try:
-            values = await opc_connector.read_nodes(node_ids)
-            ts = datetime.utcnow()
-            # Update entity + history (same observable effect for Bokeh)
-            for attr, val in zip(attrs, values):
-                attr_lower = attr.lower()
-                si3.set_attr(attr_lower, val)
-                history_repo.append(attr, val, ts)
-        except Exception as e:
-            # Don't kill the loop if there's a temporary failure
-            print(f"[polling] {type(e).__name__}: {e}")
-        await asyncio.sleep(delay)
\ No newline at end of file
+        now = loop.time()
+        due = [period for period, t in next_due.items() if t <= now]
+        attrs = [a for period in due for a in buckets[period]]
+        if attrs:
+            try:
+                t0 = loop.time()
+                data_values = await opc_connector.read_data_values([attr_map[a] for a in attrs])
+                stats.last_read_seconds = loop.time() - t0
+                stats.ticks += 1
+                received = datetime.utcnow()
+                # Update history per sample, then the entity in one batch (same observable effect for Bokeh)
+                indices, values = [], []
+                for attr, dv in zip(attrs, data_values):
+                    val = dv.Value.Value if dv.Value is not None else None
+                    val = _record(appenders[attr], val, dv, received)
+                    if val is _DROPPED:
+                        continue
+                    indices.append(index[attr])
+                    values.append(val)
+                    if attr in static:
+                        buckets[None].remove(attr)
+                si3.update_from_values(indices, values)
+            except Exception as e:
+                # Don't kill the loop if there's a temporary failure
+                print(f"[polling] {type(e).__name__}: {e}")
+
+        now = loop.time()
+        for period in due:
+            if period is None:
+                # static attrs not read yet are retried at the default rate
+                next_due[None] = now + default
+                continue
+            deadline = next_due[period] + period
+            if deadline <= now:
+                # the read overran the next deadline: skip to the next one ahead
+                late = int((now - deadline) // period) + 1
+                stats.missed_deadlines += 1
+                stats.skipped_ticks += late
+                deadline += late * period
+            next_due[period] = deadline
+        if None in buckets and not buckets[None]:
+            del buckets[None]
+            del next_due[None]
+
+        if not next_due:
+            return
+        await asyncio.sleep(max(0.0, min(next_due.values()) - loop.time()))
@@ -1,6 +1,6 @@
 # src/domain/dto.py
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 @dataclass
@@ -11,7 +11,7 @@ class LIDERDTO:
 
     @classmethod
     def from_entity(cls, si3):
-        data = {k: getattr(si3, k) for k in si3.__dataclass_fields__.keys()}
+        data = dict(zip(si3.FIELDS, si3.values()))
         return cls(payload=data, timestamp=datetime.utcnow())
 
 
@@ -130,11 +130,11 @@ async def get_raman_channel_h2o(connector) -> Optional[float]:
     """Reads Raman Channel H2O"""
     return await connector.read_node("ns=2;s=lidar_get_RamanChannelH2o")
 
-async def get_raman_range_signal_counts(connector) -> Optional[float]:
+async def get_raman_range_signal_counts(connector) -> Optional[List[float]]:
     """Reads Raman Range Signal Counts"""
     return await connector.read_node("ns=2;s=lidar_get_RamanRangeSignalCounts")
 
-async def get_statistical_error_per_bin(connector) -> Optional[float]:
+async def get_statistical_error_per_bin(connector) -> Optional[List[float]]:
     """Reads Statistical Error Per Bin"""
     return await connector.read_node("ns=2;s=lidar_get_StatisticalErrorPerBin")
 
@@ -158,17 +158,17 @@ async def get_cross_polar_532_nm(connector) -> Optional[float]:
     """Reads Cross-Polar 532nm"""
     return await connector.read_node("ns=2;s=lidar_get_CrossPolar532Nm")
 
-async def get_depolarisation_ratio_profile(connector) -> Optional[float]:
+async def get_depolarisation_ratio_profile(connector) -> Optional[List[float]]:
     """Reads Depolarisation Ratio Profile"""
     return await connector.read_node("ns=2;s=lidar_get_DepolarisationRatioProfile")
 
 # --- Derived Parameters ---
 
-async def get_backscatter_coefficient_beta_z(connector) -> Optional[float]:
+async def get_backscatter_coefficient_beta_z(connector) -> Optional[List[float]]:
     """Reads Backscatter Coefficient Beta Z"""
     return await connector.read_node("ns=2;s=lidar_get_BackscatterCoefficientBetaZ")
 
-async def get_extinction_coefficient_alpha_z(connector) -> Optional[float]:
+async def get_extinction_coefficient_alpha_z(connector) -> Optional[List[float]]:
     """Reads Extinction Coefficient Alpha Z"""
     return await connector.read_node("ns=2;s=lidar_get_ExtinctionCoefficientAlphaZ")
 
@@ -176,11 +176,11 @@ async def get_aerosol_optical_depth(connector) -> Optional[float]:
     """Reads Aerosol Optical Depth"""
     return await connector.read_node("ns=2;s=lidar_get_AerosolOpticalDepth")
 
-async def get_lidar_ratio_s_z(connector) -> Optional[float]:
+async def get_lidar_ratio_s_z(connector) -> Optional[List[float]]:
     """Reads Lidar Ratio S Z"""
     return await connector.read_node("ns=2;s=lidar_get_LidarRatioSZ")
 
-async def get_humidity_profile_h2o(connector) -> Optional[float]:
+async def get_humidity_profile_h2o(connector) -> Optional[List[float]]:
     """Reads Humidity Profile H2O"""
     return await connector.read_node("ns=2;s=lidar_get_HumidityProfileH2o")
 
@@ -192,7 +192,7 @@ async def get_cloud_base_height(connector) -> Optional[float]:
     """Reads Cloud Base Height"""
     return await connector.read_node("ns=2;s=lidar_get_CloudBaseHeight")
 
-async def get_snr_per_bin(connector) -> Optional[float]:
+async def get_snr_per_bin(connector) -> Optional[List[float]]:
     """Reads SNR Per Bin"""
     return await connector.read_node("ns=2;s=lidar_get_SnrPerBin")
 
@@ -240,7 +240,7 @@ async def get_aod_time_series(connector) -> Optional[float]:
     """Reads AOD Time Series"""
     return await connector.read_node("ns=2;s=lidar_get_AodTimeSeries")
 
-async def get_averaged_interval_profiles(connector) -> Optional[float]:
+async def get_averaged_interval_profiles(connector) -> Optional[List[float]]:
     """Reads Averaged Interval Profiles"""
     return await connector.read_node("ns=2;s=lidar_get_AveragedIntervalProfiles")
 
@@ -404,11 +404,11 @@ async def get_range_m(connector) -> Optional[float]:
     """Reads Range (m)"""
     return await connector.read_node("ns=2;s=lidar_get_RangeM")
 
-async def get_signal_counts(connector) -> Optional[float]:
+async def get_signal_counts(connector) -> Optional[List[float]]:
     """Reads Signal Counts"""
     return await connector.read_node("ns=2;s=lidar_get_SignalCounts")
 
-async def get_signal_error(connector) -> Optional[float]:
+async def get_signal_error(connector) -> Optional[List[float]]:
     """Reads Signal Error"""
     return await connector.read_node("ns=2;s=lidar_get_SignalError")
 
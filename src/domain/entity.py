@@ -1,9 +1,15 @@
 # src/domain/entity.py
-from dataclasses import dataclass, field
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+from typing import Optional, Dict, Any, Iterable, Tuple
 from datetime import datetime
 
-@dataclass
+import numpy as np
+
+# slots: ~0.9 kB per instance instead of ~3.4 kB with a __dict__, and unknown
+# names can't be set by mistake. FIELDS / FIELD_INDEX (set below the class)
+# map field positions to names, for integer-indexed updates and snapshots.
+@dataclass(slots=True)
 class LIDER:
     # --- Basic Status & Info ---
     state: Optional[int] = None                  # int32
@@ -36,24 +42,24 @@ class LIDER:
     elastic_channel_1064_nm: Optional[float] = None
     raman_channel_n2_387_nm: Optional[float] = None
     raman_channel_h2o: Optional[float] = None
-    raman_range_signal_counts: Optional[float] = None
-    statistical_error_per_bin: Optional[float] = None
+    raman_range_signal_counts: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
+    statistical_error_per_bin: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
     integration_time: Optional[float] = None
     co_polar_355_nm: Optional[float] = None
     cross_polar_355_nm: Optional[float] = None
     co_polar_532_nm: Optional[float] = None
     cross_polar_532_nm: Optional[float] = None
-    depolarisation_ratio_profile: Optional[float] = None
+    depolarisation_ratio_profile: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
 
     # --- Derived Parameters (Floats) ---
-    backscatter_coefficient_beta_z: Optional[float] = None
-    extinction_coefficient_alpha_z: Optional[float] = None
+    backscatter_coefficient_beta_z: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
+    extinction_coefficient_alpha_z: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
     aerosol_optical_depth: Optional[float] = None
-    lidar_ratio_s_z: Optional[float] = None
-    humidity_profile_h2o: Optional[float] = None
+    lidar_ratio_s_z: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
+    humidity_profile_h2o: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
     pbl_height: Optional[float] = None
     cloud_base_height: Optional[float] = None
-    snr_per_bin: Optional[float] = None
+    snr_per_bin: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
 
     # --- Metadata & Quality Indicators ---
     timestamp_utc: Optional[str] = None                     # string
@@ -68,7 +74,7 @@ class LIDER:
 
     # --- Pre-processed Products ---
     aod_time_series: Optional[float] = None                 # float
-    averaged_interval_profiles: Optional[float] = None      # float
+    averaged_interval_profiles: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
     netcdf_ascii_grid_files: Optional[str] = None           # string
     range_time_images: Optional[str] = None                 # string
     ash_cloud_automatic_detection: Optional[str] = None     # string
@@ -115,8 +121,8 @@ class LIDER:
     laser_wavelength_nm: Optional[float] = None                 # float
     channel_id: Optional[str] = None                            # string
     range_m: Optional[float] = None                             # float
-    signal_counts: Optional[float] = None                       # float
-    signal_error: Optional[float] = None                        # float
+    signal_counts: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
+    signal_error: Optional[np.ndarray] = None  # Float[]/Double[], one value per range bin
     backscatter_coef_m_sr: Optional[float] = None               # float
     extinction_coef_km_1: Optional[float] = None                # float
     depolarization_ratio: Optional[float] = None                # float
@@ -135,11 +141,25 @@ class LIDER:
 
     # generic setter (keeps single responsibility)
     def set_attr(self, name: str, value):
-        if hasattr(self, name):
+        if name in LIDER.FIELD_INDEX:
             setattr(self, name, value)
         else:
             raise AttributeError(f"SI3 has no attribute {name}")
 
+    def set_index(self, index: int, value):
+        """Sets the field at position index (see FIELD_INDEX)."""
+        setattr(self, LIDER.FIELDS[index], value)
+
+    def update_from_values(self, indices: Iterable[int], values: Iterable[Any]):
+        """Applies a batch of (field position, value) updates, e.g. one polling read."""
+        names = LIDER.FIELDS
+        for i, v in zip(indices, values):
+            setattr(self, names[i], v)
+
+    def values(self) -> Tuple[Any, ...]:
+        """All field values, in FIELDS order."""
+        return LIDER._get_all(self)
+
     def update_from_mapping(self, mapping: Dict[str, Any]):
         for k, v in mapping.items():
             if v is None:
@@ -149,3 +169,8 @@ class LIDER:
             except AttributeError:
                 # ignore unknowns or log
                 pass
+
+
+LIDER.FIELDS = tuple(f.name for f in fields(LIDER))
+LIDER.FIELD_INDEX = {name: i for i, name in enumerate(LIDER.FIELDS)}
+LIDER._get_all = attrgetter(*LIDER.FIELDS)
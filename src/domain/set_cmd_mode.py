@@ -1,7 +1,53 @@
 # src/domain/set_cmd_mode.py
-from typing import Any
+from typing import Any, List, Optional, Tuple
 from asyncua import ua
 
+# ============================================================================
+# Batched writes
+# ============================================================================
+
+class SetterBatch:
+    """
+    Collects setter calls and sends them as a single Write request.
+    Any setter below accepts the batch in place of the connector:
+
+        async with SetterBatch(connector) as batch:
+            await set_scan_mode_select(batch, 1)
+            await set_raster_width(batch, 10.0)
+            await set_raster_height(batch, 5.0)
+        print(batch.results)  # [(node_id, StatusCode), ...]
+
+    Use send() instead of the context manager to get the results directly.
+    """
+
+    def __init__(self, connector):
+        self.connector = connector
+        self._writes: List[Tuple[str, Any, Optional[ua.VariantType]]] = []
+        self.results: List[Tuple[str, ua.StatusCode]] = []
+
+    async def write_node(self, node_id: str, value: Any, variant_type=None):
+        # same signature as OpcUaConnector.write_node, but only queues the write
+        self._writes.append((node_id, value, variant_type))
+
+    def __len__(self):
+        return len(self._writes)
+
+    async def send(self) -> List[Tuple[str, ua.StatusCode]]:
+        """Sends the queued writes and returns (node_id, status) per write, in order."""
+        writes, self._writes = self._writes, []
+        statuses = await self.connector.write_nodes(writes)
+        self.results = [(node_id, st) for (node_id, _, _), st in zip(writes, statuses)]
+        return self.results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None and self._writes:
+            await self.send()
+        return False
+
+
 # ============================================================================
 # Setter functions for OPC UA connection (LIDAR)
 # ============================================================================
@@ -0,0 +1,41 @@
+# src/infrastructure/change_feed.py
+import threading
+from typing import Callable, Dict, Tuple
+
+Listener = Callable[[str], None]
+
+
+class ChangeFeed:
+    """
+    Per-attribute "new samples" notifications published by a history repo
+    after each append, on the appending thread. Listeners must only hand
+    off work (e.g. schedule a Bokeh callback) and return.
+
+    `listeners` maps attribute -> tuple of callbacks, replaced (never
+    mutated) on subscribe/unsubscribe, so publishing needs no lock; it is
+    empty when nobody listens, which appenders check before publishing.
+    """
+
+    def __init__(self):
+        self.listeners: Dict[str, Tuple[Listener, ...]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, attr: str, fn: Listener):
+        with self._lock:
+            self.listeners[attr] = self.listeners.get(attr, ()) + (fn,)
+
+    def unsubscribe(self, attr: str, fn: Listener):
+        with self._lock:
+            fns = tuple(f for f in self.listeners.get(attr, ()) if f is not fn)
+            if fns:
+                self.listeners[attr] = fns
+            else:
+                self.listeners.pop(attr, None)
+
+    def publish(self, attr: str):
+        for fn in self.listeners.get(attr, ()):
+            try:
+                fn(attr)
+            except Exception as e:
+                # a broken listener must not stop ingestion
+                print(f"[history] change listener for {attr} failed: {e}")
@@ -0,0 +1,163 @@
+# src/infrastructure/compressed_series.py
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# python type of the first sample -> how values are given back (all are stored as float64)
+KINDS = {bool: "b", int: "i", float: "f"}
+
+
+class _Block(NamedTuple):
+    first_ns: int
+    last_ns: int
+    count: int
+    payload: bytes
+
+
+def _shuffle(words: np.ndarray) -> bytes:
+    # byte-transpose 64-bit words so the (mostly constant) high bytes end up next to each other
+    return words.view(np.uint8).reshape(len(words), 8).T.tobytes()
+
+
+def _unshuffle(raw: bytes, n: int) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.uint8).reshape(8, n).T.copy().view(np.uint64).ravel()
+
+
+def encode_block(ts_ns: np.ndarray, values: np.ndarray) -> bytes:
+    """
+    Delta-of-delta timestamps and XOR-ed float64 bit patterns, byte-shuffled
+    and deflated: regular sampling turns the timestamps into zeros, and slowly
+    changing or quantized values into words with few non-zero bytes.
+    """
+    dod = np.diff(np.diff(ts_ns, prepend=0), prepend=0)
+    bits = values.astype(np.float64).view(np.uint64)
+    xor = bits ^ np.concatenate((np.zeros(1, dtype=np.uint64), bits[:-1]))
+    return zlib.compress(_shuffle(dod.view(np.uint64)) + _shuffle(xor))
+
+
+def decode_block(payload: bytes, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    raw = zlib.decompress(payload)
+    dod = _unshuffle(raw[:8 * n], n).view(np.int64)
+    xor = _unshuffle(raw[8 * n:], n)
+    ts_ns = np.cumsum(np.cumsum(dod))
+    values = np.bitwise_xor.accumulate(xor).view(np.float64)
+    return ts_ns, values
+
+
+class CompressedSeries:
+    """
+    Numeric history of one attribute: sealed blocks of `block_size` samples
+    (encode_block) plus an open block kept as plain lists, so appends never
+    touch compressed data. Only (timestamp, value) is kept. Range reads
+    decode just the blocks overlapping the range.
+    """
+
+    def __init__(self, kind: str, block_size: int = 512):
+        self.kind = kind
+        self.block_size = block_size
+        self.blocks: Deque[_Block] = deque()
+        self.open_ts: List[int] = []
+        self.open_values: List[float] = []
+        self.count = 0          # live samples
+        self.sealed_bytes = 0   # payload bytes of the sealed blocks
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        # payloads plus ~60 bytes per open sample (two list slots, an int and a float)
+        return self.sealed_bytes + 100 * len(self.blocks) + 60 * len(self.open_ts)
+
+    @property
+    def full(self) -> bool:
+        return len(self.open_ts) >= self.block_size
+
+    def append(self, ts_ns: int, value: float, cutoff_ns: int, max_bytes: Optional[int]):
+        """Adds a sample to the open block; the caller seals it once `full`."""
+        self.open_ts.append(ts_ns)
+        self.open_values.append(value)
+        self.count += 1
+        blocks = self.blocks
+        while blocks and (blocks[0].last_ns < cutoff_ns or (max_bytes is not None and self.nbytes > max_bytes)):
+            self._drop_block()
+        if not blocks and self.open_ts[0] < cutoff_ns:
+            # keep at least the newest sample, so an unchanged value stays visible
+            k = min(bisect_left(self.open_ts, cutoff_ns), len(self.open_ts) - 1)
+            del self.open_ts[:k], self.open_values[:k]
+            self.count -= k
+
+    def snapshot(self) -> "CompressedSeries":
+        """
+        Read-only copy sharing the (immutable) sealed blocks: O(blocks) pointer
+        copies, so it is cheap enough to take inside a SeqLock read.
+        """
+        snap = CompressedSeries(self.kind, self.block_size)
+        snap.blocks = self.blocks.copy()
+        snap.open_ts = self.open_ts[:]
+        snap.open_values = self.open_values[:]
+        snap.count = self.count
+        snap.sealed_bytes = self.sealed_bytes
+        return snap
+
+    def encode_open(self) -> bytes:
+        """Compressed open block; only reads it, so it can run outside the writer's SeqLock."""
+        return encode_block(np.array(self.open_ts, dtype=np.int64), np.array(self.open_values, dtype=np.float64))
+
+    def seal(self, payload: bytes):
+        """Turns the open block into a sealed one, given encode_open() (cheap)."""
+        self.blocks.append(_Block(self.open_ts[0], self.open_ts[-1], len(self.open_ts), payload))
+        self.sealed_bytes += len(payload)
+        self.open_ts, self.open_values = [], []
+
+    def _drop_block(self):
+        b = self.blocks.popleft()
+        self.sealed_bytes -= len(b.payload)
+        self.count -= b.count
+
+    def _values(self, values: np.ndarray) -> np.ndarray:
+        if self.kind == "b":
+            return values.astype(bool)
+        if self.kind == "i":
+            return values.astype(np.int64)
+        return values
+
+    def _open_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        return np.array(self.open_ts, dtype=np.int64), np.array(self.open_values, dtype=np.float64)
+
+    def range(self, since_ns: int = None, until_ns: int = None,
+              limit: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps in epoch ns, values) with since_ns <= ts <= until_ns."""
+        blocks = self.blocks
+        # blocks are ordered and non-overlapping: bisect on their bounds
+        lo_b = 0 if since_ns is None else bisect_left([b.last_ns for b in blocks], since_ns)
+        hi_b = len(blocks) if until_ns is None else bisect_right([b.first_ns for b in blocks], until_ns)
+        parts = [decode_block(blocks[i].payload, blocks[i].count) for i in range(lo_b, hi_b)]
+        if self.open_ts and (until_ns is None or self.open_ts[0] <= until_ns):
+            parts.append(self._open_arrays())
+        if not parts:
+            return np.empty(0, dtype=np.int64), self._values(np.empty(0))
+        ts = np.concatenate([p[0] for p in parts])
+        values = np.concatenate([p[1] for p in parts])
+        lo = 0 if since_ns is None else int(np.searchsorted(ts, since_ns, side="left"))
+        hi = len(ts) if until_ns is None else int(np.searchsorted(ts, until_ns, side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        lo = min(lo, hi)
+        return ts[lo:hi], self._values(values[lo:hi])
+
+    def tail(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The newest n samples, decoding blocks from the end only as needed."""
+        parts = [self._open_arrays()]
+        have = len(self.open_ts)
+        for b in reversed(self.blocks):
+            if have >= n:
+                break
+            parts.append(decode_block(b.payload, b.count))
+            have += b.count
+        ts = np.concatenate([p[0] for p in reversed(parts)])[-n:] if n > 0 else np.empty(0, dtype=np.int64)
+        values = np.concatenate([p[1] for p in reversed(parts)])[-n:] if n > 0 else np.empty(0)
+        return ts, self._values(values)
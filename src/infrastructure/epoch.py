@@ -0,0 +1,19 @@
+# src/infrastructure/epoch.py
+# Naive UTC datetime <-> int64 epoch-nanosecond conversions shared by the history repos
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+US = timedelta(microseconds=1)
+
+
+def to_ns(ts: datetime) -> int:
+    # naive UTC datetime -> int64 epoch nanoseconds
+    return ((ts - EPOCH) // US) * 1000
+
+
+def to_datetimes(ts_ns: np.ndarray) -> list:
+    # int64 epoch nanoseconds -> list of naive UTC datetimes
+    return ts_ns.view("datetime64[ns]").astype("datetime64[us]").tolist()
@@ -0,0 +1,366 @@
+# src/infrastructure/file_history_repo.py
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from infrastructure.compressed_series import KINDS as _KINDS
+from infrastructure.epoch import to_datetimes as _to_datetimes, to_ns as _to_ns
+from infrastructure.memory_history_repo import MemoryHistoryRepo, Sample
+from infrastructure.rollup import Rollups
+from infrastructure.seqlock import SeqLock
+
+# one fixed-width record per sample; bool/int values are stored as float64
+# (exact up to 2**53) and converted back on read from the attribute's kind
+_RECORD = np.dtype([("ts", "<i8"), ("value", "<f8")])
+_NS_PER_MIN = 60 * 10**9
+
+
+class _Segment:
+    """One segment file: records with start_ns <= ts < start_ns + segment length."""
+
+    def __init__(self, path: str, start_ns: int, count: int):
+        self.path = path
+        self.start_ns = start_ns
+        self.count = count  # records on disk visible to readers
+        self._map = None    # cached memmap of the first len(_map) records
+
+    def records(self) -> np.ndarray:
+        if self.count == 0:
+            return np.empty(0, dtype=_RECORD)
+        if self._map is None or len(self._map) != self.count:
+            try:
+                self._map = np.memmap(self.path, dtype=_RECORD, mode="r", shape=(self.count,))
+            except FileNotFoundError:
+                # deleted by retention after the reader's snapshot: its samples are gone anyway
+                return np.empty(0, dtype=_RECORD)
+        return self._map
+
+
+class _Attr:
+    def __init__(self, directory: str, kind: str = None):
+        self.directory = directory
+        self.kind = kind
+        self.kind_dirty = False
+        self.segments: List[_Segment] = []  # sorted by start_ns
+        self.pending: List[Tuple[int, float]] = []   # appended, not yet taken by the flusher
+        self.flushing: List[Tuple[int, float]] = []  # taken by the flusher, not yet visible on disk
+        self.appended = 0
+
+
+class FileHistoryRepo:
+    """
+    File-backed history repository with the MemoryHistoryRepo interface.
+
+    Each attribute gets a directory of append-only segment files, one per
+    `segment_minutes` of sample time, made of fixed-width (int64 epoch-ns
+    timestamp, float64 value) records. Appends only go to an in-memory
+    list; a background thread flushes them in batches every
+    `flush_interval_seconds` and deletes segments older than the retention
+    window (the newest segment of an attribute is always kept). Reads map
+    the segments overlapping the query window with mmap and binary search
+    them, then add the samples not flushed yet, so history survives a
+    restart and long windows are not held in the heap.
+
+    Only numeric/bool values fit the record format: attributes whose first
+    value is something else (e.g. strings, or profiles) are kept in memory
+    only, in a MemoryHistoryRepo with its own (short) retention
+    `memory_retention_minutes` and `memory_budget_mb`, so they don't bring
+    back the RAM ceiling the files remove. Rollups (in memory) are capped
+    from the same budget, like in MemoryHistoryRepo.
+
+    Buffers and segment counts are shared with the flush thread under a
+    lock held only for list swaps and counters; readers copy what they
+    need under it and map the files outside it. Rollups use a SeqLock per
+    attribute, as in MemoryHistoryRepo.
+    """
+
+    def __init__(self, directory: str, retention_minutes: int = 24 * 60, segment_minutes: int = 60,
+                 flush_interval_seconds: float = 1.0, memory_retention_minutes: int = 60,
+                 memory_budget_mb: float = None):
+        self.directory = directory
+        self.retention = timedelta(minutes=retention_minutes)
+        self.segment_ns = segment_minutes * _NS_PER_MIN
+        self.flush_interval_seconds = flush_interval_seconds
+        self.attrs: Dict[str, _Attr] = {}
+        self.memory_retention_minutes = memory_retention_minutes
+        self.memory_budget_mb = memory_budget_mb
+        self.memory = MemoryHistoryRepo(retention_minutes=min(retention_minutes, memory_retention_minutes),
+                                        memory_budget_mb=memory_budget_mb)  # non-numeric attributes
+        self.changes = self.memory.changes  # one feed for file-backed and in-memory attributes
+        self.rollups = Rollups()  # in memory only: starts empty after a restart
+        self._roll_guards: Dict[str, SeqLock] = {}  # attribute -> SeqLock of its rollups
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._update_budget()
+
+    def _update_budget(self):
+        # rollups of file-backed attributes are in memory: at most half an attribute's share of the budget
+        if self.memory_budget_mb is None:
+            return
+        m = self.memory
+        n_attrs = max(1, len(self.attrs) + len(m.store) + len(m.compressed) + len(m.profiles))
+        per_attr = self.memory_budget_mb * 1e6 / n_attrs
+        self.rollups.set_max_bytes(min(self.rollups.full_bytes, int(per_attr // 2)))
+
+    # ----- startup / shutdown -----
+
+    def _load(self):
+        """Picks up the segments written by previous runs."""
+        for attr in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, attr)
+            kind_path = os.path.join(path, "kind")
+            if not os.path.isfile(kind_path):
+                continue
+            with open(kind_path) as f:
+                a = _Attr(path, f.read().strip())
+            for name in sorted(os.listdir(path)):
+                if not name.endswith(".seg"):
+                    continue
+                seg_path = os.path.join(path, name)
+                # drop a partially written trailing record, if any
+                count = os.path.getsize(seg_path) // _RECORD.itemsize
+                os.truncate(seg_path, count * _RECORD.itemsize)
+                a.segments.append(_Segment(seg_path, int(name[:-4]), count))
+            a.segments.sort(key=lambda s: s.start_ns)
+            a.appended = sum(s.count for s in a.segments)
+            self.attrs[attr] = a
+
+    def start(self):
+        """Starts the background flush thread (done on the first append otherwise)."""
+        if self._flusher is None:
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="history-flush", daemon=True)
+            self._flusher.start()
+
+    def close(self):
+        """Stops the flush thread and writes out everything still buffered."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    # ----- writes -----
+
+    def append(self, attr: str, value: Any, ts: datetime = None,
+               server_ts: datetime = None, status: Any = None, received: datetime = None):
+        self.appender(attr)(value, ts, server_ts, status, received)
+
+    def appender(self, attr: str) -> Callable[..., None]:
+        """
+        Same as MemoryHistoryRepo.appender. The returned function only
+        buffers the sample; no file I/O happens on the caller's thread.
+        """
+        lock = self._lock
+        state = [self.attrs.get(attr), None]  # file-backed attribute, in-memory appender
+        roll = self.rollups.roller(attr)
+        roll_guard = self._roll_guards.setdefault(attr, SeqLock())
+        changes = self.changes
+
+        def append(value: Any, ts: datetime = None, server_ts: datetime = None,
+                   status: Any = None, received: datetime = None):
+            a = state[0]
+            if a is None:
+                a = state[0] = self.attrs.get(attr)
+            if a is None:
+                if state[1] is None and type(value) in _KINDS and attr not in self.memory.store:
+                    a = state[0] = self._attr(attr, _KINDS[type(value)])
+                else:
+                    if state[1] is None:
+                        state[1] = self.memory.appender(attr)
+                    state[1](value, ts, server_ts, status, received)
+                    return
+            try:
+                v = float(value)
+            except (TypeError, ValueError):
+                print(f"[history] {attr}: non-numeric value {value!r} not stored")
+                return
+            kind = _KINDS.get(type(value), "f")
+            ts_ns = _to_ns(ts or server_ts or received or datetime.utcnow())
+            with lock:
+                if kind != a.kind and (a.kind == "b" or kind == "f"):
+                    a.kind, a.kind_dirty = kind, True  # widen bool -> int -> float
+                a.pending.append((ts_ns, v))
+                a.appended += 1
+            with roll_guard:
+                roll(ts_ns, value)
+            if self._flusher is None:
+                self.start()
+            if changes.listeners:
+                changes.publish(attr)
+
+        return append
+
+    def _attr(self, attr: str, kind: str) -> _Attr:
+        with self._lock:
+            a = self.attrs.get(attr)
+            if a is None:
+                a = self.attrs[attr] = _Attr(os.path.join(self.directory, attr), kind)
+                a.kind_dirty = True
+        self._update_budget()
+        return a
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[history] flush error: {type(e).__name__}: {e}")
+
+    def flush(self):
+        """Writes the buffered samples of every attribute, then applies retention."""
+        for a in list(self.attrs.values()):
+            with self._lock:
+                if not a.pending and not a.kind_dirty:
+                    continue
+                # records left over from a failed write are retried first
+                a.flushing, a.pending = a.flushing + a.pending, []
+                kind, kind_dirty, a.kind_dirty = a.kind, a.kind_dirty, False
+            if kind_dirty:
+                os.makedirs(a.directory, exist_ok=True)
+                with open(os.path.join(a.directory, "kind"), "w") as f:
+                    f.write(kind)
+            if a.flushing:
+                self._write(a, np.array(a.flushing, dtype=_RECORD))
+        self._apply_retention()
+
+    def _write(self, a: _Attr, records: np.ndarray):
+        # split the batch by segment; segment counts are only published once written, together
+        # with dropping those records from a.flushing, so readers see each sample exactly once
+        seg_starts = records["ts"] - records["ts"] % self.segment_ns
+        bounds = np.flatnonzero(np.diff(seg_starts)) + 1
+        for chunk in np.split(records, bounds):
+            start_ns = int(chunk["ts"][0] - chunk["ts"][0] % self.segment_ns)
+            seg = next((s for s in a.segments if s.start_ns == start_ns), None)
+            if seg is None:
+                seg = _Segment(os.path.join(a.directory, f"{start_ns}.seg"), start_ns, 0)
+            with open(seg.path, "ab") as f:
+                f.write(chunk.tobytes())
+            with self._lock:
+                if seg not in a.segments:
+                    a.segments.append(seg)
+                    a.segments.sort(key=lambda s: s.start_ns)
+                seg.count += len(chunk)
+                del a.flushing[:len(chunk)]
+
+    def _apply_retention(self):
+        cutoff_ns = _to_ns(datetime.utcnow() - self.retention)
+        for a in list(self.attrs.values()):
+            with self._lock:
+                expired = [s for s in a.segments[:-1] if s.start_ns + self.segment_ns <= cutoff_ns]
+                for s in expired:
+                    a.segments.remove(s)
+            for s in expired:
+                try:
+                    os.remove(s.path)
+                except OSError:
+                    pass
+
+    # ----- reads -----
+
+    def _snapshot(self, attr: str):
+        a = self.attrs.get(attr)
+        if a is None:
+            return None, [], [], 0
+        with self._lock:
+            # segment counts and buffers are read together, so no sample is seen twice
+            segments = [(s, s.count) for s in a.segments]
+            buffered = a.flushing + a.pending
+            return a, segments, buffered, a.appended
+
+    def get_arrays(self, attr: str, since: datetime = None, until: datetime = None,
+                   limit: int = None, copy: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (timestamps as int64 epoch ns, values) with since <= ts <= until,
+        like NumpyHistoryRepo.get_arrays but always returning copies.
+        """
+        if attr not in self.attrs:
+            return self.memory.get_arrays(attr, since, until, limit)
+        a, segments, buffered, _ = self._snapshot(attr)
+        if a is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        lo_ns = None if since is None else _to_ns(since)
+        hi_ns = None if until is None else _to_ns(until)
+        parts = []
+        for seg, count in segments:
+            if lo_ns is not None and seg.start_ns + self.segment_ns <= lo_ns:
+                continue
+            if hi_ns is not None and seg.start_ns > hi_ns:
+                break
+            parts.append(seg.records()[:count])
+        if buffered:
+            parts.append(np.array(buffered, dtype=_RECORD))
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=_RECORD)
+        ts = records["ts"]
+        lo = 0 if lo_ns is None else int(np.searchsorted(ts, lo_ns, side="left"))
+        hi = len(ts) if hi_ns is None else int(np.searchsorted(ts, hi_ns, side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        lo = min(lo, hi)
+        return np.array(ts[lo:hi]), self._values(a, records["value"][lo:hi])
+
+    @staticmethod
+    def _values(a: _Attr, values: np.ndarray) -> np.ndarray:
+        if a.kind == "b":
+            return values.astype(bool)
+        if a.kind == "i":
+            return values.astype(np.int64)
+        return np.array(values)
+
+    def get_history(self, attr: str, since: datetime = None, until: datetime = None,
+                    limit: int = None) -> List[Tuple[datetime, Any]]:
+        if attr not in self.attrs:
+            return self.memory.get_history(attr, since, until, limit)
+        ts, values = self.get_arrays(attr, since, until, limit)
+        return list(zip(_to_datetimes(ts), values.tolist()))
+
+    def get_samples(self, attr: str, since: datetime = None, until: datetime = None,
+                    limit: int = None) -> List[Sample]:
+        if attr not in self.attrs:
+            return self.memory.get_samples(attr, since, until, limit)
+        return [Sample(ts, value) for ts, value in self.get_history(attr, since, until, limit)]
+
+    def read_since(self, attr: str, seq: int = 0) -> Tuple[List[Tuple[datetime, Any]], int]:
+        """Same as MemoryHistoryRepo.read_since (sequence numbers continue across restarts)."""
+        if attr not in self.attrs:
+            return self.memory.read_since(attr, seq)
+        a, segments, buffered, total = self._snapshot(attr)
+        new = total - seq
+        if new <= 0:
+            return [], total
+        # walk back from the newest samples until `new` are collected
+        parts, need = [], new
+        if buffered:
+            parts.append(np.array(buffered[-need:], dtype=_RECORD))
+            need -= len(parts[-1])
+        for seg, count in reversed(segments):
+            if need <= 0:
+                break
+            parts.append(seg.records()[max(0, count - need):count])
+            need -= len(parts[-1])
+        if not parts:
+            return [], total
+        records = np.concatenate(parts[::-1])
+        values = self._values(a, records["value"])
+        return list(zip(_to_datetimes(records["ts"]), values.tolist())), total
+
+    def get_rollup(self, attr: str, since: datetime, until: datetime = None,
+                   points: int = 1000) -> Optional[np.ndarray]:
+        """Aggregated buckets for long windows, see Rollups.query; None = use get_history."""
+        if attr not in self.attrs:
+            return self.memory.get_rollup(attr, since, until, points)
+        guard = self._roll_guards.get(attr)
+        if guard is None:
+            return None
+        return guard.read(lambda: self.rollups.query(attr, since, until, points))
+
+    def set_retention(self, minutes: int):
+        """Changes the retention window; it applies from the next flush."""
+        self.retention = timedelta(minutes=minutes)
+        self.memory.set_retention(min(minutes, self.memory_retention_minutes))
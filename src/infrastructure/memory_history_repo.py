@@ -1,32 +1,372 @@
 # src/infrastructure/memory_history_repo.py
 from collections import defaultdict, deque
 from datetime import datetime, timedelta
-from typing import Any, Deque, Tuple, Dict, List
+from itertools import islice
+from typing import Any, Callable, Deque, Tuple, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from infrastructure.change_feed import ChangeFeed
+from infrastructure.compressed_series import KINDS, CompressedSeries
+from infrastructure.epoch import EPOCH, US, to_datetimes, to_ns
+from infrastructure.profile_series import DEFAULT_MAX_BYTES, ProfileSeries, is_profile
+from infrastructure.rollup import Rollups
+from infrastructure.seqlock import SeqLock
+
+
+class Sample(NamedTuple):
+    ts: datetime                          # SourceTimestamp (falls back to server/receive time)
+    value: Any
+    server_ts: Optional[datetime] = None  # ServerTimestamp, if the server sent one
+    status: Any = None                    # OPC UA StatusCode, None = good/unknown
+    received: Optional[datetime] = None   # client receive time
+
+
+# rough size of one Sample with its datetimes, used to turn a memory budget into a sample cap
+_SAMPLE_BYTES = 200
+
 
 class MemoryHistoryRepo:
-    def __init__(self, retention_minutes: int = 10):
+    """
+    Retention is configured once, as a time window (retention_minutes, on
+    receive time) and/or a memory budget shared by all attributes. It is
+    enforced on append; reads never prune, each consumer passes its own
+    view window (since/until) instead.
+
+    Appends come from one thread (the asyncio loop) while Bokeh reads from
+    its own: each attribute has a SeqLock that the writer bumps around
+    every append, and readers retry their (short) read if it overlapped
+    one, so the writer never blocks and readers get consistent snapshots.
+    After each append, `changes` (a ChangeFeed) notifies the attribute's
+    listeners, so readers can redraw on new data instead of polling.
+
+    With compress=True, numeric attributes are kept in CompressedSeries
+    (blocks of `block_size` samples, delta-of-delta timestamps and XOR-ed
+    values) instead of Sample deques: a few bytes per sample, for long
+    retention on small machines, but only the timestamp and value are kept
+    (get_samples has no server timestamp/status/receive time for them), and
+    retention is checked on the sample timestamp, always keeping the newest
+    sample. Rollups of numeric attributes count towards the memory budget.
+
+    Profile-valued attributes (1-D NumPy arrays, one value per range bin)
+    go to a ProfileSeries: one row of a 2D buffer per profile, with the
+    same timestamp-only storage and retention as compressed series.
+    get_arrays returns their values as an (n, bins) array. The memory
+    budget is split by per-sample size, so a profile keeps about as many
+    rows as a scalar attribute keeps samples.
+    """
+
+    def __init__(self, retention_minutes: int = 10, memory_budget_mb: float = None,
+                 compress: bool = False, block_size: int = 512):
         self.retention = timedelta(minutes=retention_minutes)
-        # attribute -> deque of (timestamp, value)
-        self.store: Dict[str, Deque[Tuple[datetime, Any]]] = defaultdict(lambda: deque())
+        self.memory_budget_mb = memory_budget_mb
+        self.compress = compress
+        self.block_size = block_size
+        # per-attribute sample cap (deques) and byte cap (compressed series)
+        # derived from the budget, shared with the appenders
+        self._max_samples: List[Optional[int]] = [None]
+        self._max_bytes: List[Optional[int]] = [None]
+        # attribute -> deque of Sample
+        self.store: Dict[str, Deque[Sample]] = defaultdict(lambda: deque())
+        # attribute -> compressed numeric series (compress=True)
+        self.compressed: Dict[str, CompressedSeries] = {}
+        # attribute -> profile series (array-valued attributes)
+        self.profiles: Dict[str, ProfileSeries] = {}
+        # attribute -> number of samples ever appended (sequence number of the newest one)
+        self.appended: Dict[str, int] = defaultdict(int)
+        # min/max/mean/count/last buckets for long windows
+        self.rollups = Rollups()
+        # attribute -> SeqLock guarding its series and rollups
+        self._guards: Dict[str, SeqLock] = {}
+        # "attribute has new samples" notifications, published after each append
+        self.changes = ChangeFeed()
+
+    def append(self, attr: str, value: Any, ts: datetime = None,
+               server_ts: datetime = None, status: Any = None, received: datetime = None):
+        self.appender(attr)(value, ts, server_ts, status, received)
+
+    def appender(self, attr: str) -> Callable[..., None]:
+        """
+        Returns append(value, ts, server_ts, status, received) bound to the
+        attribute's storage, for ingest paths that resolve the attribute once.
+        Pruning uses the sample's receive time (no extra clock read) and pops
+        at most what expired, so it is O(1) amortized.
+        """
+        if attr in self.profiles:
+            return self._profile_appender(attr)
+        if attr in self.store or attr in self.compressed:
+            return self._scalar_appender(attr)
+        # new attribute: the first value decides between a profile series and scalar storage
+        state = [None]
+
+        def append(value: Any, ts: datetime = None, server_ts: datetime = None,
+                   status: Any = None, received: datetime = None):
+            fn = state[0]
+            if fn is None:
+                fn = state[0] = self._profile_appender(attr) if is_profile(value) else self._scalar_appender(attr)
+            fn(value, ts, server_ts, status, received)
+
+        return append
+
+    def _scalar_appender(self, attr: str) -> Callable[..., None]:
+        if self.compress and attr not in self.store:
+            return self._compressed_appender(attr)
+        return self._deque_appender(attr)
+
+    def _profile_appender(self, attr: str) -> Callable[..., None]:
+        appended = self.appended
+        guard = self._guards.setdefault(attr, SeqLock())
+        changes = self.changes
+
+        def append(value: Any, ts: datetime = None, server_ts: datetime = None,
+                   status: Any = None, received: datetime = None):
+            if not is_profile(value):
+                print(f"[history] {attr}: non-profile value {value!r} not stored")
+                return
+            received = received or datetime.utcnow()
+            ts_ns = to_ns(ts or server_ts or received)
+            cutoff_ns = to_ns(received - self.retention)
+            series = self.profiles.get(attr)
+            if series is None or len(value) != series.bins:
+                if series is not None:
+                    print(f"[history] {attr}: profile length changed {series.bins} -> {len(value)}, history restarted")
+                    series = series.restarted(value, self._max_bytes[0])
+                else:
+                    series = ProfileSeries(len(value), value.dtype, self._max_bytes[0] or DEFAULT_MAX_BYTES)
+                with guard:
+                    self.profiles[attr] = series
+                self._update_budget()
+            with guard:
+                series.append(ts_ns, value, cutoff_ns)
+                appended[attr] += 1
+            if changes.listeners:
+                changes.publish(attr)
 
-    def append(self, attr: str, value: Any, ts: datetime = None):
-        ts = ts or datetime.utcnow()
+        return append
+
+    def _deque_appender(self, attr: str) -> Callable[..., None]:
+        if attr not in self.store:
+            self.store[attr] = deque()
+            self._update_budget()
         q = self.store[attr]
-        q.append((ts, value))
-        self._prune(attr)
+        appended = self.appended
+        max_samples = self._max_samples
+        roll = self.rollups.roller(attr)
+        guard = self._guards.setdefault(attr, SeqLock())
+        changes = self.changes
+
+        def append(value: Any, ts: datetime = None, server_ts: datetime = None,
+                   status: Any = None, received: datetime = None):
+            received = received or datetime.utcnow()
+            ts = ts or server_ts or received
+            sample = Sample(ts, value, server_ts, status, received)
+            cutoff = received - self.retention
+            with guard:
+                q.append(sample)
+                roll(to_ns(ts), value)
+                appended[attr] += 1
+                while q[0].received < cutoff:
+                    q.popleft()
+                # the cap drops when attributes are added: shrink down to it
+                while max_samples[0] is not None and len(q) > max_samples[0]:
+                    q.popleft()
+            if changes.listeners:
+                changes.publish(attr)
+
+        return append
+
+    def _compressed_appender(self, attr: str) -> Callable[..., None]:
+        # the first value decides: numbers go to a CompressedSeries, anything else to a deque
+        appended = self.appended
+        max_bytes = self._max_bytes
+        roll = self.rollups.roller(attr)
+        guard = self._guards.setdefault(attr, SeqLock())
+        state = [self.compressed.get(attr), None]  # series, deque appender
+        changes = self.changes
+
+        def append(value: Any, ts: datetime = None, server_ts: datetime = None,
+                   status: Any = None, received: datetime = None):
+            series = state[0]
+            if series is None:
+                if state[1] is None:
+                    if type(value) in KINDS:
+                        series = state[0] = self.compressed[attr] = CompressedSeries(KINDS[type(value)],
+                                                                                      self.block_size)
+                        self._update_budget()
+                    else:
+                        state[1] = self._deque_appender(attr)
+                if series is None:
+                    state[1](value, ts, server_ts, status, received)
+                    return
+            kind = KINDS.get(type(value))
+            if kind is None:
+                print(f"[history] {attr}: non-numeric value {value!r} not stored")
+                return
+            if kind != series.kind and (series.kind == "b" or kind == "f"):
+                series.kind = kind  # widen bool -> int -> float
+            received = received or datetime.utcnow()
+            ts_ns = to_ns(ts or server_ts or received)
+            cutoff_ns = to_ns(received - self.retention)
+            with guard:
+                series.append(ts_ns, value, cutoff_ns, max_bytes[0])
+                roll(ts_ns, value)
+                appended[attr] += 1
+            if series.full:
+                # compress outside the guarded section, publish the block inside it
+                payload = series.encode_open()
+                with guard:
+                    series.seal(payload)
+            if changes.listeners:
+                changes.publish(attr)
+
+        return append
+
+    def _update_budget(self):
+        if self.memory_budget_mb is not None:
+            # split by per-sample size, so a 2000-bin profile keeps as many rows as a scalar keeps samples
+            weight = (len(self.store) + len(self.compressed)) * _SAMPLE_BYTES
+            weight += sum(series.row_bytes for series in self.profiles.values())
+            per_byte = self.memory_budget_mb * 1e6 / max(1, weight)
+            per_attr = per_byte * _SAMPLE_BYTES
+            # scalar attributes pay for their rollups (at most half their share) out of the same budget
+            rollup_bytes = min(self.rollups.full_bytes, int(per_attr // 2))
+            self.rollups.set_max_bytes(rollup_bytes)
+            self._max_samples[0] = max(1, int((per_attr - rollup_bytes) / _SAMPLE_BYTES))
+            self._max_bytes[0] = int(per_attr - rollup_bytes)
+            for series in self.profiles.values():
+                series.set_max_bytes(int(per_byte * series.row_bytes))
+
+    def _range(self, attr: str, since: datetime = None, until: datetime = None,
+               limit: int = None) -> List[Sample]:
+        """
+        Samples with since <= ts <= until (binary search on ts, which is
+        non-decreasing per attribute); limit keeps the newest `limit` of them.
+        """
+        guard = self._guards.get(attr)
+        if guard is None:
+            return []
+        if attr in self.compressed:
+            # copies the block list and open block, decodes outside the guarded read
+            ts, values = self.get_arrays(attr, since, until, limit)
+            return [Sample(t, v) for t, v in zip(to_datetimes(ts), values.tolist())]
+        if attr in self.profiles:
+            ts, values = self.get_arrays(attr, since, until, limit)
+            return [Sample(t, v) for t, v in zip(to_datetimes(ts), values)]
+        q = self.store.get(attr)
+        if not q:
+            return []
+        return guard.read(lambda: _slice(q, since, until, limit),
+                          lambda: _slice(tuple(q), since, until, limit))
+
+    def get_history(self, attr: str, since: datetime = None, until: datetime = None,
+                    limit: int = None) -> List[Tuple[datetime, Any]]:
+        return [(s.ts, s.value) for s in self._range(attr, since, until, limit)]
 
-    def _prune(self, attr: str):
-        cutoff = datetime.utcnow() - self.retention
+    def get_arrays(self, attr: str, since: datetime = None, until: datetime = None,
+                   limit: int = None, copy: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (timestamps as int64 epoch ns, values) like NumpyHistoryRepo.get_arrays,
+        for array consumers; always copies (copy is accepted for compatibility).
+        Profiles come back as an (n, bins) array.
+        """
+        guard = self._guards.get(attr)
+        since_ns = None if since is None else to_ns(since)
+        until_ns = None if until is None else to_ns(until)
+        if guard is not None and attr in self.profiles:
+            return guard.read(lambda: self.profiles[attr].range(since_ns, until_ns, limit))
+        series = self.compressed.get(attr)
+        if guard is not None and series is not None:
+            return guard.read(series.snapshot).range(since_ns, until_ns, limit)
+        samples = self._range(attr, since, until, limit)
+        # timedelta arithmetic: several times faster than numpy's datetime parsing
+        ts = np.fromiter(((s.ts - EPOCH) // US for s in samples), dtype=np.int64, count=len(samples)) * 1000
+        values = [s.value for s in samples]
+        try:
+            return ts, np.array(values)
+        except ValueError:
+            # sequences of different lengths: one object per sample
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            return ts, column
+
+    def get_samples(self, attr: str, since: datetime = None, until: datetime = None,
+                    limit: int = None) -> List[Sample]:
+        """Like get_history, but with server timestamp, status and receive time."""
+        return self._range(attr, since, until, limit)
+
+    def read_since(self, attr: str, seq: int = 0) -> Tuple[List[Tuple[datetime, Any]], int]:
+        """
+        Incremental read: samples appended after sequence number seq, and the
+        sequence number to pass next time. Costs O(new samples); samples
+        already dropped by retention are skipped.
+        """
+        guard = self._guards.get(attr)
+        if guard is None:
+            return [], 0
+        series = self.compressed.get(attr)
+        if series is not None:
+            total, snap = guard.read(lambda: (self.appended[attr], series.snapshot()))
+            if total <= seq:
+                return [], total
+            ts, values = snap.tail(min(total - seq, len(snap)))
+            return list(zip(to_datetimes(ts), values.tolist())), total
+        if attr in self.profiles:
+            def profile_tail():
+                total = self.appended[attr]
+                series = self.profiles[attr]
+                return total, series.tail(min(max(total - seq, 0), len(series)))
+
+            total, (ts, values) = guard.read(profile_tail)
+            return list(zip(to_datetimes(ts), values)), total
         q = self.store[attr]
-        while q and q[0][0] < cutoff:
-            q.popleft()
 
-    def get_history(self, attr: str) -> List[Tuple[datetime, Any]]:
-        self._prune(attr)
-        return list(self.store[attr])
+        def tail():
+            total = self.appended[attr]
+            # C-level copy of the newest samples (no interleaved append possible)
+            return total, list(islice(reversed(q), min(max(total - seq, 0), len(q))))
+
+        total, items = guard.read(tail)
+        items.reverse()
+        return [(s.ts, s.value) for s in items], total
+
+    def get_rollup(self, attr: str, since: datetime, until: datetime = None,
+                   points: int = 1000) -> Optional[np.ndarray]:
+        """Aggregated buckets for long windows, see Rollups.query; None = use get_history."""
+        guard = self._guards.get(attr)
+        if guard is None:
+            return None
+        return guard.read(lambda: self.rollups.query(attr, since, until, points))
 
     def set_retention(self, minutes: int):
+        """Changes the retention window; it applies from the next append of each attribute."""
         self.retention = timedelta(minutes=minutes)
-        # prune all
-        for a in list(self.store.keys()):
-            self._prune(a)
+
+
+def _slice(q: Sequence[Sample], since: datetime, until: datetime, limit: Optional[int]) -> List[Sample]:
+    """Samples of q (deque or tuple) with since <= ts <= until, the newest `limit` of them."""
+    n = len(q)
+    lo = 0 if since is None else _bisect(q, since, right=False)
+    hi = n if until is None else _bisect(q, until, right=True)
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    if lo >= hi:
+        return []
+    if lo >= n - hi:
+        # closer to the right end: walk the deque from there
+        items = list(islice(reversed(q), n - hi, n - lo))
+        items.reverse()
+        return items
+    return list(islice(q, lo, hi))
+
+
+def _bisect(q: Sequence[Sample], ts: datetime, right: bool) -> int:
+    # bisect_left/right on the sample timestamps of a deque
+    lo, hi = 0, len(q)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        t = q[mid].ts
+        if t < ts or (right and t == ts):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,310 @@
+# src/infrastructure/numpy_history_repo.py
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from infrastructure.change_feed import ChangeFeed
+from infrastructure.epoch import US as _US, to_datetimes as _to_datetimes, to_ns as _to_ns
+from infrastructure.memory_history_repo import Sample
+from infrastructure.profile_series import DEFAULT_MAX_BYTES, ProfileSeries, is_profile
+from infrastructure.rollup import Rollups
+from infrastructure.seqlock import SeqLock
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+# python type of the first sample -> value dtype (ICD types are int32/float/bool)
+_DTYPES = {bool: np.bool_, int: np.int32, float: np.float64}
+
+
+class _Series:
+    """
+    Columnar buffer for one attribute: int64 epoch-ns timestamps plus a typed
+    value array. Live samples are always the contiguous slice [start, end),
+    so readers get views; when the write position reaches the end of the
+    buffer, the live window is moved back to the front (amortized O(1),
+    thanks to the slack past `capacity`).
+    """
+
+    def __init__(self, dtype, capacity: int, max_capacity: int):
+        self.capacity = capacity
+        self.max_capacity = max_capacity
+        self.start = 0
+        self.end = 0
+        self.appended = 0  # samples ever appended (sequence number of the newest one)
+        self._alloc(dtype, capacity)
+
+    def _alloc(self, dtype, capacity: int):
+        n = capacity + max(16, capacity // 4)
+        self.ts = np.empty(n, dtype=np.int64)
+        self.values = np.empty(n, dtype=dtype)
+        # values of this exact python type (ints: within range) are stored without further checks
+        self.fast_type = {np.bool_: bool, np.float64: float}.get(self.values.dtype.type)
+        if self.values.dtype.kind == "i":
+            info = np.iinfo(self.values.dtype)
+            self.int_range = (int(info.min), int(info.max))
+        else:
+            self.int_range = None
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _resize(self, dtype, capacity: int):
+        ts, values = self.ts[self.start:self.end], self.values[self.start:self.end]
+        self.capacity = capacity
+        self._alloc(dtype, capacity)
+        n = len(ts)
+        self.ts[:n] = ts
+        self.values[:n] = values
+        self.start, self.end = 0, n
+
+    def _compact(self):
+        # move the live window to the front of the buffers (overlap-safe copies)
+        n = self.end - self.start
+        self.ts[:n] = self.ts[self.start:self.end]
+        self.values[:n] = self.values[self.start:self.end]
+        if self.values.dtype == object:
+            self.values[n:] = None  # drop references to evicted samples
+        self.start, self.end = 0, n
+
+    def _store_type(self, value):
+        """Promotes the value array (int32 -> int64 -> float64 -> object) if value doesn't fit."""
+        kind = self.values.dtype.kind
+        if kind == "O":
+            return
+        is_bool = isinstance(value, (bool, np.bool_))
+        is_int = isinstance(value, (int, np.integer)) and not is_bool
+        is_float = isinstance(value, (float, np.floating))
+        if kind == "b":
+            new = None if is_bool else object
+        elif kind == "i":
+            if is_int and self.int_range[0] <= value <= self.int_range[1]:
+                new = None
+            elif is_int and -2**63 <= value < 2**63:
+                new = np.int64
+            else:
+                new = np.float64 if (is_float or is_int) else object
+        else:  # float
+            new = None if (is_float or is_int or is_bool) else object
+        if new is not None:
+            self._resize(new, self.capacity)
+
+    def append(self, ts_ns: int, value, cutoff_ns: int):
+        t = type(value)
+        if t is not self.fast_type and not (t is int and self.int_range
+                                            and self.int_range[0] <= value <= self.int_range[1]):
+            self._store_type(value)
+        # drop expired samples, always keeping the newest one so values that
+        # haven't changed in longer than the retention window stay visible
+        ts = self.ts
+        while self.end - self.start > 1 and ts[self.start] < cutoff_ns:
+            self.start += 1
+        # full, or over a (possibly lowered) memory budget: drop the oldest samples
+        while self.end - self.start >= self.max_capacity:
+            self.start += 1
+        if self.end - self.start >= self.capacity:
+            self._resize(self.values.dtype, min(self.capacity * 2, self.max_capacity))
+        if self.end == len(self.ts):
+            self._compact()
+        i = self.end
+        self.ts[i] = ts_ns
+        self.values[i] = value
+        self.end = i + 1
+        self.appended += 1
+
+    def nbytes_per_sample(self) -> int:
+        # object values are counted as a pointer plus a small python object
+        return 8 + (72 if self.values.dtype == object else self.values.itemsize)
+
+
+class NumpyHistoryRepo:
+    """
+    History repository backed by preallocated NumPy buffers per attribute:
+    16 bytes/sample for numeric values, instead of a tuple and datetimes.
+    Same append/get_history contract as MemoryHistoryRepo; get_arrays()
+    returns zero-copy views for readers that can work on arrays.
+
+    Values are stored as bool, int32 or float64 based on the first sample
+    (promoted to int64/float64/object if a later value doesn't fit).
+    Only the sample timestamp is kept (no server timestamp, status or
+    receive time), and retention is applied on it at append time, always
+    keeping the newest sample of each attribute. memory_budget_mb caps the
+    total buffer size (rollups included), split between attributes in
+    proportion to their per-sample size.
+    Reads never prune.
+    Profile-valued attributes (1-D arrays) go to a ProfileSeries, one row
+    of a 2D buffer per profile; get_arrays returns them as (n, bins).
+
+    Concurrency is the same as MemoryHistoryRepo (per-attribute SeqLock):
+    get_history, get_samples, read_since, get_rollup and the copy=True
+    array reads are safe from other threads; zero-copy views are only
+    valid on the appending thread.
+    """
+
+    def __init__(self, retention_minutes: int = 10, capacity: int = 1024, max_capacity: int = 1 << 20,
+                 memory_budget_mb: float = None):
+        self.retention = timedelta(minutes=retention_minutes)
+        self.capacity = capacity
+        self.max_capacity = max(capacity, max_capacity)
+        self.memory_budget_mb = memory_budget_mb
+        self.store: Dict[str, _Series] = {}
+        self.profiles: Dict[str, ProfileSeries] = {}
+        self.rollups = Rollups()
+        self._guards: Dict[str, SeqLock] = {}
+        self.changes = ChangeFeed()  # see MemoryHistoryRepo.changes
+
+    def _update_budget(self):
+        # split the memory budget by per-sample size: every attribute keeps about as many samples
+        if self.memory_budget_mb is None:
+            return
+        weights = [series.nbytes_per_sample() for series in self.store.values()]
+        weight = sum(weights) + sum(profile.row_bytes for profile in self.profiles.values())
+        per_byte = self.memory_budget_mb * 1e6 / max(1, weight)
+        # rollups (at most half the smallest scalar share) come out of the same budget
+        rollup_bytes = min(self.rollups.full_bytes, int(per_byte * min(weights, default=0) // 2))
+        self.rollups.set_max_bytes(rollup_bytes)
+        for series in self.store.values():
+            share = per_byte * series.nbytes_per_sample() - rollup_bytes
+            series.max_capacity = max(1, min(self.max_capacity, int(share // series.nbytes_per_sample())))
+        for profile in self.profiles.values():
+            profile.set_max_bytes(int(per_byte * profile.row_bytes))
+
+    def append(self, attr: str, value: Any, ts: datetime = None,
+               server_ts: datetime = None, status: Any = None, received: datetime = None):
+        self.appender(attr)(value, ts, server_ts, status, received)
+
+    def appender(self, attr: str) -> Callable[..., None]:
+        """Same as MemoryHistoryRepo.appender."""
+        cache = [None, 0]  # retention seen last, in ns
+        roll = self.rollups.roller(attr)
+        guard = self._guards.setdefault(attr, SeqLock())
+        changes = self.changes
+
+        def append(value: Any, ts: datetime = None, server_ts: datetime = None,
+                   status: Any = None, received: datetime = None):
+            series = self.store.get(attr)
+            if series is None:
+                if attr in self.profiles or is_profile(value):
+                    append_profile(value, ts, server_ts, received)
+                    return
+                dtype = _DTYPES.get(type(value), object)
+                series = self.store[attr] = _Series(dtype, self.capacity, self.max_capacity)
+                self._update_budget()
+            ts_ns = _to_ns(ts or server_ts or received or datetime.utcnow())
+            if cache[0] is not self.retention:
+                cache[0], cache[1] = self.retention, (self.retention // _US) * 1000
+            with guard:
+                series.append(ts_ns, value, ts_ns - cache[1])
+                roll(ts_ns, value)
+            if changes.listeners:
+                changes.publish(attr)
+
+        def append_profile(value: Any, ts: datetime, server_ts: datetime, received: datetime):
+            if not is_profile(value):
+                print(f"[history] {attr}: non-profile value {value!r} not stored")
+                return
+            ts_ns = _to_ns(ts or server_ts or received or datetime.utcnow())
+            if cache[0] is not self.retention:
+                cache[0], cache[1] = self.retention, (self.retention // _US) * 1000
+            profile = self.profiles.get(attr)
+            if profile is None or len(value) != profile.bins:
+                if profile is not None:
+                    print(f"[history] {attr}: profile length changed {profile.bins} -> {len(value)}, history restarted")
+                    profile = profile.restarted(value, None)
+                else:
+                    profile = ProfileSeries(len(value), value.dtype, DEFAULT_MAX_BYTES)
+                with guard:
+                    self.profiles[attr] = profile
+                self._update_budget()
+            with guard:
+                profile.append(ts_ns, value, ts_ns - cache[1])
+            if changes.listeners:
+                changes.publish(attr)
+
+        return append
+
+    def _guarded_copy(self, attr: str, read: Callable[[], tuple]) -> tuple:
+        guard = self._guards.get(attr)
+        if guard is None:
+            return read()
+        return guard.read(lambda: tuple(a.copy() if isinstance(a, np.ndarray) else a for a in read()))
+
+    def get_arrays(self, attr: str, since: datetime = None, until: datetime = None,
+                   limit: int = None, copy: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (timestamps as int64 epoch ns, values) with since <= ts <= until,
+        found by binary search; limit keeps the newest `limit` samples.
+        Both are read-only views into the buffer, valid until the next
+        append; copy=True returns copies taken consistently from any thread.
+        """
+        if attr in self.profiles:
+            # (n, bins) copies, taken consistently from any thread (no zero-copy profile views)
+            since_ns = None if since is None else _to_ns(since)
+            until_ns = None if until is None else _to_ns(until)
+            return self._guards[attr].read(lambda: self.profiles[attr].range(since_ns, until_ns, limit))
+        if copy:
+            return self._guarded_copy(attr, lambda: self.get_arrays(attr, since, until, limit))
+        series = self.store.get(attr)
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        ts = series.ts[series.start:series.end]
+        lo = 0 if since is None else int(np.searchsorted(ts, _to_ns(since), side="left"))
+        hi = len(ts) if until is None else int(np.searchsorted(ts, _to_ns(until), side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        lo = min(lo, hi)
+        return _readonly(ts[lo:hi]), _readonly(series.values[series.start + lo:series.start + hi])
+
+    def read_arrays_since(self, attr: str, seq: int = 0,
+                          copy: bool = False) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Incremental read: (timestamps, values) views of the samples appended
+        after sequence number seq, and the sequence number to pass next time.
+        copy=True as in get_arrays.
+        """
+        if attr in self.profiles:
+            def profile_tail():
+                profile = self.profiles[attr]
+                return profile.tail(min(profile.appended - seq, len(profile))) + (profile.appended,)
+
+            return self._guards[attr].read(profile_tail)
+        if copy:
+            return self._guarded_copy(attr, lambda: self.read_arrays_since(attr, seq))
+        series = self.store.get(attr)
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), 0
+        new = min(series.appended - seq, series.end - series.start)
+        if new <= 0:
+            return series.ts[0:0], series.values[0:0], series.appended
+        lo = series.end - new
+        return _readonly(series.ts[lo:series.end]), _readonly(series.values[lo:series.end]), series.appended
+
+    def get_history(self, attr: str, since: datetime = None, until: datetime = None,
+                    limit: int = None) -> List[Tuple[datetime, Any]]:
+        ts, values = self.get_arrays(attr, since, until, limit, copy=True)
+        return list(zip(_to_datetimes(ts), values.tolist() if values.ndim == 1 else values))
+
+    def get_samples(self, attr: str, since: datetime = None, until: datetime = None,
+                    limit: int = None) -> List[Sample]:
+        return [Sample(ts, value) for ts, value in self.get_history(attr, since, until, limit)]
+
+    def read_since(self, attr: str, seq: int = 0) -> Tuple[List[Tuple[datetime, Any]], int]:
+        """Same as MemoryHistoryRepo.read_since."""
+        ts, values, seq = self.read_arrays_since(attr, seq, copy=True)
+        return list(zip(_to_datetimes(ts), values.tolist() if values.ndim == 1 else values)), seq
+
+    def get_rollup(self, attr: str, since: datetime, until: datetime = None,
+                   points: int = 1000) -> Optional[np.ndarray]:
+        """Aggregated buckets for long windows, see Rollups.query; None = use get_history."""
+        guard = self._guards.get(attr)
+        if guard is None:
+            return None
+        return guard.read(lambda: self.rollups.query(attr, since, until, points))
+
+    def set_retention(self, minutes: int):
+        """Changes the retention window; it applies from the next append of each attribute."""
+        self.retention = timedelta(minutes=minutes)
@@ -1,16 +1,91 @@
 # src/infrastructure/opcua_connector.py
 import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
 from asyncua import Client, ua, Node
-from typing import List, Any
+from asyncua.common.ua_utils import value_to_datavalue
+from typing import List, Any, Tuple, Optional, Callable, Awaitable, Sequence, Dict, Union
+
+_OP_LIMITS_IDS = {
+    "max_nodes_per_read": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead,
+    "max_nodes_per_write": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerWrite,
+    "max_nodes_per_method_call": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerMethodCall,
+    "max_monitored_items_per_call": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxMonitoredItemsPerCall,
+}
+
+# status codes meaning a cached NodeId is no longer valid on the server
+_STALE_NODE_CODES = {
+    ua.StatusCodes.BadNodeIdUnknown,
+    ua.StatusCodes.BadNodeIdInvalid,
+    ua.StatusCodes.BadMethodInvalid,
+}
+
+# monitored-item results meaning the DataChangeFilter (deadband) was refused
+_FILTER_REFUSED_CODES = {
+    ua.StatusCodes.BadFilterNotAllowed,
+    ua.StatusCodes.BadMonitoredItemFilterUnsupported,
+    ua.StatusCodes.BadMonitoredItemFilterInvalid,
+    ua.StatusCodes.BadDeadbandFilterInvalid,
+}
+
+DEFAULT_SUBSCRIPTION = "default"
+
+
+def _data_change_filter(deadband_abs: Optional[float], deadband_pct: Optional[float]):
+    if deadband_abs is None and deadband_pct is None:
+        return None
+    mfilter = ua.DataChangeFilter()
+    mfilter.Trigger = ua.DataChangeTrigger.StatusValue
+    if deadband_abs is not None:
+        mfilter.DeadbandType = ua.DeadbandType.Absolute.value
+        mfilter.DeadbandValue = float(deadband_abs)
+    else:
+        mfilter.DeadbandType = ua.DeadbandType.Percent.value
+        mfilter.DeadbandValue = float(deadband_pct)
+    return mfilter
+
+
+@dataclass
+class OperationLimits:
+    # None (or 0 on the server side) means "no limit published"
+    max_nodes_per_read: Optional[int] = None
+    max_nodes_per_write: Optional[int] = None
+    max_nodes_per_method_call: Optional[int] = None
+    max_monitored_items_per_call: Optional[int] = None
+
+
+def _chunks(items: Sequence, size: Optional[int]) -> List[Sequence]:
+    if not size or size >= len(items):
+        return [items]
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
 
 class OpcUaConnector:
-    def __init__(self, opc_url: str, timeout: int = 5_000, security_string: str = None):
+    def __init__(self, opc_url: str, timeout: int = 5_000, security_string: str = None,
+                 max_in_flight: int = 4, node_cache_size: int = 1024):
         self.url = opc_url
         self._client = Client(self.url, timeout=timeout/1000.0)
         self.security_string = security_string
-        self._subscription = None
+        self._subscriptions: Dict[str, Any] = {}
         self._sub_handler = None
+        # monitored-item client handle -> node_id, for every item we create.
+        # Starts far above asyncua's own counter so the two can never collide.
+        self.client_handles: Dict[int, str] = {}
+        self._next_client_handle = 1_000_000
         self._lock = asyncio.Lock()  # necessary for disconnect and to avoid race conditions
+        # server OperationLimits, read once per connect()
+        self.limits = OperationLimits()
+        # max number of chunked requests awaiting a response at the same time
+        self.max_in_flight = max(1, int(max_in_flight))
+        # string NodeId -> Node (LRU). Cleared on connect() and when the
+        # server's NamespaceArray changes, since "ns=2" may then mean something else.
+        self._node_cache: "OrderedDict[str, Node]" = OrderedDict()
+        self._node_cache_size = max(1, int(node_cache_size))
+        self._namespaces: Optional[List[str]] = None
+        # method registry: browse paths -> object Node, object NodeId -> {method name: NodeId}
+        self._objects: Dict[Tuple[str, ...], Node] = {}
+        self._methods: Dict[str, Dict[str, ua.NodeId]] = {}
+        self._method_ids: Dict[Tuple[str, str], ua.NodeId] = {}
 
     @property
     def client(self) -> Client:
@@ -20,17 +95,100 @@ class OpcUaConnector:
         if self.security_string:
             await self._client.set_security_string(self.security_string)
         await self._client.connect()
+        self.invalidate_node_cache()
+        self.limits = await self._read_operation_limits()
+        await self.refresh_namespaces()
+
+    # --------- NODE CACHE ----------
+    def get_node(self, node_id: str) -> Node:
+        """Returns the Node for a string NodeId, parsing it only on a cache miss."""
+        node = self._node_cache.get(node_id)
+        if node is not None:
+            self._node_cache.move_to_end(node_id)
+            return node
+        node = self._client.get_node(node_id)
+        self._node_cache[node_id] = node
+        if len(self._node_cache) > self._node_cache_size:
+            self._node_cache.popitem(last=False)
+        return node
+
+    def invalidate_node_cache(self):
+        self._node_cache.clear()
+        self.invalidate_method_registry()
+
+    async def refresh_namespaces(self) -> bool:
+        """
+        Re-reads the server NamespaceArray; drops the node cache if it changed.
+        Returns True when the cache was invalidated. Called on connect() and
+        from the periodic connection check, so a change while connected is
+        picked up within one check.
+        """
+        try:
+            namespaces = await self._client.get_namespace_array()
+        except Exception as e:
+            print(f"[NamespaceArray] could not be read: {type(e).__name__}: {e}")
+            return False
+        changed = self._namespaces is not None and namespaces != self._namespaces
+        self._namespaces = namespaces
+        if changed:
+            print("[NamespaceArray] changed on the server; node cache cleared")
+            self.invalidate_node_cache()
+        return changed
+    # -------------------------------
+
+    async def _read_operation_limits(self) -> OperationLimits:
+        """
+        Reads Server/ServerCapabilities/OperationLimits in one Read request.
+        Missing nodes, bad statuses or 0 are treated as "no limit".
+        """
+        params = ua.ReadParameters()
+        for object_id in _OP_LIMITS_IDS.values():
+            rv = ua.ReadValueId()
+            rv.NodeId = ua.NodeId(object_id, 0)
+            rv.AttributeId = ua.AttributeIds.Value
+            params.NodesToRead.append(rv)
+        try:
+            results = await self._client.uaclient.read(params)
+        except Exception as e:
+            print(f"[OperationLimits] could not be read, using no limits: {type(e).__name__}: {e}")
+            return OperationLimits()
+        values = {}
+        for field_name, dv in zip(_OP_LIMITS_IDS.keys(), results):
+            ok = dv.StatusCode is None or dv.StatusCode.is_good()
+            value = dv.Value.Value if (ok and dv.Value is not None) else None
+            values[field_name] = int(value) if value else None
+        return OperationLimits(**values)
+
+    async def _run_chunked(self, items: Sequence, size: Optional[int],
+                           send: Callable[[Sequence], Awaitable[List[Any]]]) -> List[Any]:
+        """
+        Splits items into chunks of at most `size` and sends them concurrently
+        (at most max_in_flight at a time). Results are concatenated in order.
+        """
+        chunks = _chunks(items, size)
+        if len(chunks) == 1:
+            return list(await send(chunks[0]))
+        sem = asyncio.Semaphore(self.max_in_flight)
+
+        async def _send(chunk):
+            async with sem:
+                return await send(chunk)
+
+        results = []
+        for part in await asyncio.gather(*(_send(c) for c in chunks)):
+            results.extend(part)
+        return results
 
     async def disconnect(self):
         async with self._lock:
-            if self._subscription is not None:
+            for subscription in self._subscriptions.values():
                 try:
-                    await self._subscription.delete()
+                    await subscription.delete()
                 except Exception:
                     pass
-                finally:
-                    self._subscription = None
-                    self._sub_handler = None
+            self._subscriptions.clear()
+            self.client_handles.clear()
+            self._sub_handler = None
             if self._client is not None:
                 try:
                     await self._client.disconnect()
@@ -45,40 +203,152 @@ class OpcUaConnector:
 
     async def read_node(self, node_id: str):
         self._ensure_connected()
-        node = self._client.get_node(node_id)
+        node = self.get_node(node_id)
         return await node.read_value()
 
-    async def read_nodes(self, node_ids: List[str]):
+    async def read_data_values(self, node_ids: List[str]) -> List[ua.DataValue]:
+        """
+        Reads the Value attribute of every node in a single Read service call
+        (split in chunks if the server publishes MaxNodesPerRead).
+        Returns the raw DataValues in the same order as node_ids.
+        """
         self._ensure_connected()
-        nodes = [self._client.get_node(nid) for nid in node_ids]
-        return await asyncio.gather(*(n.read_value() for n in nodes))
+        if not node_ids:
+            return []
+
+        async def _read(chunk):
+            params = ua.ReadParameters()
+            params.TimestampsToReturn = ua.TimestampsToReturn.Both
+            for nid in chunk:
+                rv = ua.ReadValueId()
+                rv.NodeId = self.get_node(nid).nodeid
+                rv.AttributeId = ua.AttributeIds.Value
+                params.NodesToRead.append(rv)
+            return await self._client.uaclient.read(params)
+
+        return await self._run_chunked(list(node_ids), self.limits.max_nodes_per_read, _read)
+
+    async def read_nodes(self, node_ids: List[str]) -> List[Tuple[Any, ua.StatusCode]]:
+        """
+        Bulk read: one Read request for all node_ids.
+        Returns (value, status_code) pairs in the same order as node_ids;
+        value is None when the status is not good.
+        """
+        results = []
+        for dv in await self.read_data_values(node_ids):
+            status = dv.StatusCode or ua.StatusCode()
+            value = dv.Value.Value if (dv.Value is not None and status.is_good()) else None
+            results.append((value, status))
+        return results
 
     async def write_node(self, node_id: str, value: Any, variant_type=None):
         self._ensure_connected()
-        node = self._client.get_node(node_id)
+        node = self.get_node(node_id)
         if variant_type is not None:
             val = ua.Variant(value, variant_type)
             return await node.write_value(val)
         else:
             return await node.write_value(value)
 
-    # --------- SUBSCRIPTION (no behavior changes) ----------
-    async def create_subscription(self, period_ms: int, handler):
-        if self._subscription:
-            await self._subscription.delete()
+    async def write_nodes(self, writes: Sequence[Tuple[str, Any, Optional[ua.VariantType]]]) -> List[ua.StatusCode]:
+        """
+        Bulk write: one Write request for all (node_id, value, variant_type)
+        entries (split in chunks if the server publishes MaxNodesPerWrite).
+        Returns one StatusCode per entry, in order; bad statuses are not raised.
+        """
+        self._ensure_connected()
+        if not writes:
+            return []
+
+        async def _write(chunk):
+            params = ua.WriteParameters()
+            for node_id, value, variant_type in chunk:
+                wv = ua.WriteValue()
+                wv.NodeId = self.get_node(node_id).nodeid
+                wv.AttributeId = ua.AttributeIds.Value
+                wv.Value = value_to_datavalue(value, variant_type)
+                params.NodesToWrite.append(wv)
+            return await self._client.uaclient.write(params)
+
+        return await self._run_chunked(list(writes), self.limits.max_nodes_per_write, _write)
+
+    # --------- SUBSCRIPTIONS ----------
+    # Several named subscriptions can coexist (one per node group), each with
+    # its own publishing interval. "default" keeps the single-subscription usage.
+    async def create_subscription(self, period_ms: int, handler, name: str = DEFAULT_SUBSCRIPTION):
+        old = self._subscriptions.pop(name, None)
+        if old is not None:
+            await old.delete()
         self._sub_handler = handler
-        self._subscription = await self._client.create_subscription(period_ms, handler)
-        return self._subscription
-
-    async def subscribe_to_nodes(self, node_ids: List[str]):
-        if not self._subscription:
-            raise RuntimeError("subscription not created; call create_subscription first")
-        nodes = [self._client.get_node(nid) for nid in node_ids]
-        handles = []
-        for n in nodes:
-            h = await self._subscription.subscribe_data_change(n)
-            handles.append(h)
+        subscription = await self._client.create_subscription(period_ms, handler)
+        self._subscriptions[name] = subscription
+        return subscription
+
+    @property
+    def _subscription(self):
+        return self._subscriptions.get(DEFAULT_SUBSCRIPTION)
+
+    async def subscribe_to_nodes(self, node_ids: List[str], subscription: str = DEFAULT_SUBSCRIPTION,
+                                 sampling_interval_ms: float = 0.0, queue_size: int = 0,
+                                 deadband_abs: Optional[float] = None,
+                                 deadband_pct: Optional[float] = None) -> Dict[str, Union[int, ua.StatusCode]]:
+        """
+        Creates the monitored items for all node_ids in one CreateMonitoredItems
+        call (split in chunks if the server publishes MaxMonitoredItemsPerCall).
+        sampling_interval_ms=-1 samples at the publishing interval; a deadband
+        (absolute or percent of EURange) adds a DataChangeFilter. Items whose
+        node refuses the filter (e.g. non-numeric) are re-created without it.
+        Returns node_id -> handle; failed items map to their bad StatusCode
+        and don't abort the rest.
+        """
+        sub = self._subscriptions.get(subscription)
+        if sub is None:
+            raise RuntimeError(f"subscription '{subscription}' not created; call create_subscription first")
+        node_ids = list(node_ids)
+        mfilter = _data_change_filter(deadband_abs, deadband_pct)
+
+        async def _create(ids, item_filter):
+            requests = [self._monitored_item_request(nid, sampling_interval_ms, queue_size, item_filter) for nid in ids]
+            results = await self._run_chunked(requests, self.limits.max_monitored_items_per_call,
+                                              sub.create_monitored_items)
+            for request, result in zip(requests, results):
+                if isinstance(result, ua.StatusCode):
+                    # refused by the server (retried items get a new handle): this one never reports
+                    self.client_handles.pop(request.RequestedParameters.ClientHandle, None)
+            return results
+
+        handles = dict(zip(node_ids, await _create(node_ids, mfilter)))
+        if mfilter is not None:
+            refused = [nid for nid, h in handles.items()
+                       if isinstance(h, ua.StatusCode) and h.value in _FILTER_REFUSED_CODES]
+            if refused:
+                handles.update(zip(refused, await _create(refused, None)))
+        failed = {nid: h for nid, h in handles.items() if isinstance(h, ua.StatusCode)}
+        if failed:
+            details = ", ".join(f"{nid} ({st.name})" for nid, st in failed.items())
+            print(f"[subscription] {len(failed)}/{len(node_ids)} monitored items failed: {details}")
         return handles
+
+    def _monitored_item_request(self, node_id: str, sampling_interval_ms: float, queue_size: int,
+                                mfilter) -> ua.MonitoredItemCreateRequest:
+        rv = ua.ReadValueId()
+        rv.NodeId = self.get_node(node_id).nodeid
+        rv.AttributeId = ua.AttributeIds.Value
+        self._next_client_handle += 1
+        handle = self._next_client_handle
+        self.client_handles[handle] = node_id
+        mparams = ua.MonitoringParameters()
+        mparams.ClientHandle = handle
+        mparams.SamplingInterval = sampling_interval_ms
+        mparams.QueueSize = queue_size
+        mparams.DiscardOldest = True
+        if mfilter is not None:
+            mparams.Filter = mfilter
+        mir = ua.MonitoredItemCreateRequest()
+        mir.ItemToMonitor = rv
+        mir.MonitoringMode = ua.MonitoringMode.Reporting
+        mir.RequestedParameters = mparams
+        return mir
     # ----------------------------------------------------------------
 
    
@@ -88,56 +358,144 @@ class OpcUaConnector:
 
     # src/infrastructure/opcua_connector.py
 
+    # --------- METHOD REGISTRY ----------
+    # Objects and their methods are resolved once per session and served from
+    # memory afterwards. The registry is dropped on connect(), when the
+    # NamespaceArray changes, and when a call fails because the cached NodeIds
+    # are no longer valid on the server (address space changed).
+    async def resolve_object(self, *paths: str) -> Node:
+        """
+        Returns the first object under Objects found by BrowseName path
+        (e.g. resolve_object("2:LIDER", "2:Controls")); cached per session.
+        """
+        self._ensure_connected()
+        key = tuple(paths)
+        node = self._objects.get(key)
+        if node is not None:
+            return node
+        errors = []
+        for path in paths:
+            try:
+                node = await self._client.nodes.objects.get_child([path])
+                break
+            except Exception as e:
+                errors.append(f"{path}: {e}")
+        if node is None:
+            raise RuntimeError(f"Could not find any of {', '.join(paths)} under Objects: {'; '.join(errors)}")
+        self._objects[key] = node
+        return node
+
+    async def resolve_methods(self, obj: Node) -> Dict[str, ua.NodeId]:
+        """
+        Returns lower-case method name -> method NodeId for the HasComponent
+        children of obj. One Browse request (NodeClass and BrowseName come in the
+        ReferenceDescriptions), cached per session.
+        """
+        key = obj.nodeid.to_string()
+        methods = self._methods.get(key)
+        if methods is None:
+            refs = await obj.get_references(
+                ua.ObjectIds.HasComponent,
+                direction=ua.BrowseDirection.Forward,
+                nodeclassmask=ua.NodeClass.Method,
+            )
+            methods = {}
+            for r in refs:
+                if r.NodeClass != ua.NodeClass.Method:
+                    continue
+                methods[(r.BrowseName.Name or "").strip().lower()] = r.NodeId
+            self._methods[key] = methods
+        return methods
+
+    async def resolve_method_id(self, obj: Node, method_id) -> ua.NodeId:
+        """
+        Resolves a method given as NodeId, NodeId string ("ns=2;s=ServFixed")
+        or BrowseName ("2:ServFixed") to the NodeId published under obj.
+        Cached per session.
+        """
+        if isinstance(method_id, ua.NodeId):
+            return method_id
+        key = (obj.nodeid.to_string(), str(method_id))
+        nodeid = self._method_ids.get(key)
+        if nodeid is not None:
+            return nodeid
+        methods = await self.resolve_methods(obj)
+        try:
+            parsed = ua.NodeId.from_string(method_id)
+        except Exception:
+            parsed = None
+        if parsed is not None and parsed in methods.values():
+            nodeid = parsed
+        else:
+            name = str(parsed.Identifier) if parsed is not None else str(method_id).split(":")[-1]
+            nodeid = methods.get(name.strip().lower())
+        if nodeid is None:
+            # not a direct child method: let the server resolve the browse path
+            nodeid = (await obj.get_child(method_id)).nodeid
+        self._method_ids[key] = nodeid
+        return nodeid
+
+    def invalidate_method_registry(self):
+        self._objects.clear()
+        self._methods.clear()
+        self._method_ids.clear()
+
+    async def call_method(self, obj_paths: Sequence[str], method_id, *args):
+        """
+        Calls method_id on the first object of obj_paths that exists, using the
+        registry. If the server rejects the cached NodeIds, the registry is
+        refreshed once and the call retried.
+        """
+        for attempt in range(2):
+            obj = await self.resolve_object(*obj_paths)
+            try:
+                nodeid = await self.resolve_method_id(obj, method_id)
+                return await obj.call_method(nodeid, *args)
+            except ua.UaStatusCodeError as e:
+                if attempt or e.code not in _STALE_NODE_CODES:
+                    raise
+                self.invalidate_method_registry()
+    # -------------------------------------
+
     async def call_controls_method(self, ns_idx: int, method_name: str, *args):
         """
         Calls a method under 'Controls' by resolving the real NodeId:
         1. Gets 'Controls' by its BrowseName (e.g.: "2:Controls").
-        2. Enumerates its children (HasComponent) and filters those that are Methods.
+        2. Enumerates its children (HasComponent) that are Methods.
         3. Compares the BrowseName.Name of each method (case-insensitive).
         4. Calls the method using the specific NodeId found.
+        Steps 1-3 are served from the method registry after the first call.
         """
         self._ensure_connected()
         controls_node = None
         try:
-            # 1) Get the Controls object by its BrowseName
-            controls_node = await self.client.nodes.objects.get_child([f"{ns_idx}:Controls"])
+            for attempt in range(2):
+                # 1) Get the Controls object by its BrowseName
+                controls_node = await self.resolve_object(f"{ns_idx}:Controls")
 
-            # 2) Enumerate components and filter methods (Your original logic)
-            refs = await controls_node.get_references(ua.ObjectIds.HasComponent, direction=ua.BrowseDirection.Forward)
-            target_method_node = None
-            names_seen = []
+                # 2-3) Methods published under Controls, by lower-case name
+                methods = await self.resolve_methods(controls_node)
+                method_id = methods.get(method_name.strip().lower())
+                if method_id is None:
+                    if attempt == 0:
+                        # the server may have added it since we cached the list
+                        self.invalidate_method_registry()
+                        continue
+                    lista = ", ".join(sorted(methods)) if methods else "(no published methods)"
+                    raise RuntimeError(
+                        f"Method '{method_name}' not found under {controls_node.nodeid}. "
+                        f"Available: {lista}"
+                    )
 
-            for r in refs:
-                node = self.client.get_node(r.NodeId)
-                
-                if await node.read_node_class() != ua.NodeClass.Method:
-                    continue
-                
-                # ===== THE CORRECTED LINE IS HERE! =====
-                bn = await node.read_browse_name()
-                # ======================================
-
-                names_seen.append(bn.to_string())
-                
-                # Compare only .Name (ignore ns) and case-insensitive
-                if (bn.Name or "").strip().lower() == method_name.strip().lower():
-                    target_method_node = node
-                    break # Found the method
-
-            if target_method_node is None:
-                lista = ", ".join(sorted(names_seen)) if names_seen else "(no published methods)"
-                raise RuntimeError(
-                    f"Method '{method_name}' not found under {controls_node.nodeid}. "
-                    f"Available: {lista}"
-                )
-
-            # 3) Call using the real NodeId of the method (e.g.: ns=2;i=115)
-            #    (This was the key part of your original logic)
-            return await controls_node.call_method(target_method_node.nodeid, *args)
+                # 4) Call using the real NodeId of the method (e.g.: ns=2;i=115)
+                try:
+                    return await controls_node.call_method(method_id, *args)
+                except ua.UaStatusCodeError as e:
+                    if attempt or e.code not in _STALE_NODE_CODES:
+                        raise
+                    self.invalidate_method_registry()
 
         except Exception as e:
-            # Corrected debug block
             node_id_str = str(controls_node.nodeid) if controls_node else "Controls(not found)"
             print(f"[Debug] call_controls_method logic failed at {node_id_str} for {method_name}: {type(e).__name__}: {e}")
             raise e
-
@@ -0,0 +1,104 @@
+# src/infrastructure/profile_series.py
+from typing import Optional, Tuple
+
+import numpy as np
+
+# cap on one profile series when no memory budget applies (~2 h of 2000-bin float32 profiles at 1 Hz)
+DEFAULT_MAX_BYTES = 64 * 10**6
+
+
+def is_profile(value) -> bool:
+    """Whether value is a profile: a 1-D numeric NumPy array (how array variants are ingested)."""
+    return isinstance(value, np.ndarray) and value.ndim == 1 and value.dtype.kind in "biuf"
+
+
+class ProfileSeries:
+    """
+    History of one profile-valued attribute (one value per range bin):
+    int64 epoch-ns timestamps plus a (rows, bins) array with one row per
+    profile, so a 2000-bin float32 profile costs 8 kB and one row copy
+    instead of a list of Python floats. Bins and dtype come from the
+    first profile. Live rows are the contiguous slice [start, end),
+    moved back to the front when the write position reaches the end of
+    the buffer (like _Series), so reads are plain slices.
+
+    Only (timestamp, profile) is kept, and retention is applied on the
+    timestamp at append time, always keeping the newest profile.
+    """
+
+    def __init__(self, bins: int, dtype, max_bytes: int = DEFAULT_MAX_BYTES, capacity: int = 64):
+        self.bins = bins
+        self.dtype = np.dtype(dtype)
+        self.start = 0
+        self.end = 0
+        self.appended = 0  # profiles ever appended (sequence number of the newest one)
+        self.set_max_bytes(max_bytes)
+        self.capacity = 0
+        self.ts = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, bins), dtype=self.dtype)
+        self._resize(min(capacity, self.max_rows))
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def row_bytes(self) -> int:
+        return 8 + self.bins * self.dtype.itemsize
+
+    def set_max_bytes(self, max_bytes: int):
+        self.max_rows = max(1, int(max_bytes // self.row_bytes))
+
+    def _resize(self, capacity: int):
+        n = capacity + max(16, capacity // 4)
+        live = self.end - self.start
+        ts = np.empty(n, dtype=np.int64)
+        values = np.empty((n, self.bins), dtype=self.dtype)
+        ts[:live] = self.ts[self.start:self.end]
+        values[:live] = self.values[self.start:self.end]
+        self.ts, self.values = ts, values
+        self.capacity = capacity
+        self.start, self.end = 0, live
+
+    def append(self, ts_ns: int, profile: np.ndarray, cutoff_ns: int):
+        """Stores a profile of `bins` values (cast to the series dtype)."""
+        ts = self.ts
+        while self.end - self.start > 1 and ts[self.start] < cutoff_ns:
+            self.start += 1
+        # full, or over a (possibly lowered) memory budget: drop the oldest profiles
+        while self.end - self.start >= self.max_rows:
+            self.start += 1
+        if self.end - self.start >= self.capacity:
+            self._resize(min(self.capacity * 2, self.max_rows))
+        if self.end == len(self.ts):
+            # move the live rows to the front (overlap-safe copies)
+            n = self.end - self.start
+            self.ts[:n] = self.ts[self.start:self.end]
+            self.values[:n] = self.values[self.start:self.end]
+            self.start, self.end = 0, n
+        i = self.end
+        self.ts[i] = ts_ns
+        self.values[i] = profile
+        self.end = i + 1
+        self.appended += 1
+
+    def range(self, since_ns: int = None, until_ns: int = None,
+              limit: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of (timestamps, (n, bins) profiles) with since_ns <= ts <= until_ns."""
+        ts = self.ts[self.start:self.end]
+        lo = 0 if since_ns is None else int(np.searchsorted(ts, since_ns, side="left"))
+        hi = len(ts) if until_ns is None else int(np.searchsorted(ts, until_ns, side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        lo = min(lo, hi)
+        return ts[lo:hi].copy(), self.values[self.start + lo:self.start + hi].copy()
+
+    def tail(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the newest n profiles."""
+        lo = max(self.start, self.end - max(n, 0))
+        return self.ts[lo:self.end].copy(), self.values[lo:self.end].copy()
+
+    def restarted(self, profile: np.ndarray, max_bytes: Optional[int]) -> "ProfileSeries":
+        """A new, empty series shaped for profile (its length changed), continuing the sequence numbers."""
+        series = ProfileSeries(len(profile), profile.dtype, DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+        series.appended = self.appended
+        return series
@@ -0,0 +1,209 @@
+# src/infrastructure/rollup.py
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from infrastructure.epoch import to_ns
+
+# one aggregated bucket; `ts` is the bucket start in epoch ns
+BUCKET = np.dtype([("ts", "<i8"), ("min", "<f8"), ("max", "<f8"), ("mean", "<f8"),
+                   ("count", "<i8"), ("last", "<f8")])
+
+# (bucket length in seconds, buckets kept): 1 s for an hour, 10 s for a day, 1 min for a week
+ROLLUP_TIERS: Tuple[Tuple[int, int], ...] = ((1, 3600), (10, 8640), (60, 7 * 1440))
+
+_NUMERIC = (float, int, bool)
+
+
+class _Tier:
+    """
+    Buckets of one resolution for one attribute: the open bucket as a plain
+    list [start_ns, min, max, sum, count, last] plus the closed ones in a
+    growable numpy buffer (live slice [start, end), like _Series).
+    """
+
+    def __init__(self, bucket_seconds: int, keep: int, coarser: Optional["_Tier"]):
+        self.bucket_ns = bucket_seconds * 10**9
+        self.keep = keep
+        self.coarser = coarser
+        self.open: Optional[list] = None
+        self.buf = np.empty(min(keep, 64), dtype=BUCKET)
+        self.start = 0
+        self.end = 0
+        self.dropped = False  # whether old buckets were evicted
+
+    def reaches(self, since_ns: int) -> bool:
+        """Whether the kept buckets go back to since_ns (or nothing was evicted yet)."""
+        return not self.dropped or (self.end > self.start and self.buf["ts"][self.start] <= since_ns)
+
+    def add(self, start_ns: int, mn: float, mx: float, sm: float, count: int, last: float):
+        """Merges a sample (count=1) or a finer bucket into this tier, O(1)."""
+        b = start_ns - start_ns % self.bucket_ns
+        o = self.open
+        if o is not None and b <= o[0]:
+            # same bucket (late samples are folded into the open one)
+            if mn < o[1]:
+                o[1] = mn
+            if mx > o[2]:
+                o[2] = mx
+            o[3] += sm
+            o[4] += count
+            o[5] = last
+            return
+        self.open = [b, mn, mx, sm, count, last]
+        if o is not None:
+            self._close(o)
+
+    def _close(self, o: list):
+        # keep may have been lowered (memory budget): drop down to it
+        while self.end - self.start >= self.keep:
+            self.start += 1
+            self.dropped = True
+        if self.end == len(self.buf):
+            n = self.end - self.start
+            size = len(self.buf)
+            if size > self.keep + self.keep // 4:
+                size = self.keep + self.keep // 4
+            elif n * 2 > size and size < self.keep:
+                size = min(size * 2, self.keep + self.keep // 4)
+            buf = self.buf if size == len(self.buf) else np.empty(size, dtype=BUCKET)
+            buf[:n] = self.buf[self.start:self.end]
+            self.buf, self.start, self.end = buf, 0, n
+        self.buf[self.end] = (o[0], o[1], o[2], o[3] / o[4], o[4], o[5])
+        self.end += 1
+        if self.coarser is not None:
+            self.coarser.add(*o)
+
+    def buckets(self, since_ns: Optional[int], until_ns: Optional[int]) -> np.ndarray:
+        """Copy of the buckets starting in [since_ns - bucket, until_ns], open bucket included."""
+        live = self.buf[self.start:self.end]
+        if self.open is not None:
+            o = self.open
+            live = np.concatenate([live, np.array([(o[0], o[1], o[2], o[3] / o[4], o[4], o[5])], dtype=BUCKET)])
+        ts = live["ts"]
+        lo = 0 if since_ns is None else int(np.searchsorted(ts, since_ns - self.bucket_ns, side="right"))
+        hi = len(ts) if until_ns is None else int(np.searchsorted(ts, until_ns, side="right"))
+        return np.array(live[lo:hi])
+
+
+def merge_buckets(buckets: np.ndarray, group_ns: int) -> np.ndarray:
+    """
+    Merges consecutive buckets into buckets of group_ns (a multiple of their
+    length), aligned to absolute time so only the newest one changes as
+    samples arrive: min of mins, max of maxes, count-weighted mean, last.
+    """
+    if len(buckets) == 0:
+        return buckets
+    key = buckets["ts"] // group_ns
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    counts = buckets["count"]
+    out = np.empty(len(starts), dtype=BUCKET)
+    out["ts"] = key[starts] * group_ns
+    out["min"] = np.fmin.reduceat(buckets["min"], starts)
+    out["max"] = np.fmax.reduceat(buckets["max"], starts)
+    out["count"] = np.add.reduceat(counts, starts)
+    out["mean"] = np.add.reduceat(buckets["mean"] * counts, starts) / np.maximum(out["count"], 1)
+    out["last"] = buckets["last"][np.r_[starts[1:], len(buckets)] - 1]
+    return out
+
+
+class Rollups:
+    """
+    Incremental min/max/mean/count/last rollups per numeric attribute, at the
+    resolutions in `tiers` (finest first). A sample only touches the open
+    bucket of the finest tier; coarser tiers are fed when a bucket closes.
+    Non-numeric values are ignored.
+
+    max_bytes caps each attribute's buckets (repos derive it from their
+    memory budget): every tier is shortened by the same factor, so long
+    windows fall back to coarser tiers sooner.
+    """
+
+    def __init__(self, tiers: Tuple[Tuple[int, int], ...] = ROLLUP_TIERS, max_bytes: int = None):
+        self.tiers = tiers
+        self.max_bytes = max_bytes
+        self.store: Dict[str, List[_Tier]] = {}
+
+    @property
+    def full_bytes(self) -> int:
+        """Buffer size of one attribute's tiers when full and uncapped."""
+        return sum(keep + keep // 4 for _, keep in self.tiers) * BUCKET.itemsize
+
+    def _keeps(self) -> List[int]:
+        scale = 1.0 if self.max_bytes is None else min(1.0, self.max_bytes / self.full_bytes)
+        return [max(1, int(keep * scale)) for _, keep in self.tiers]
+
+    def set_max_bytes(self, max_bytes: Optional[int]):
+        """Changes the per-attribute cap; tiers shrink as their next buckets close."""
+        self.max_bytes = max_bytes
+        keeps = self._keeps()
+        for tiers in self.store.values():
+            for tier, keep in zip(tiers, keeps):
+                tier.keep = keep
+
+    def _attr_tiers(self, attr: str) -> List[_Tier]:
+        tiers = self.store.get(attr)
+        if tiers is None:
+            coarser = None
+            tiers = []
+            for (seconds, _), keep in reversed(list(zip(self.tiers, self._keeps()))):
+                coarser = _Tier(seconds, keep, coarser)
+                tiers.insert(0, coarser)
+            self.store[attr] = tiers
+        return tiers
+
+    def roller(self, attr: str) -> Callable[[int, Any], None]:
+        """Returns roll(ts_ns, value) for the attribute, for the repos' appenders."""
+        state = [None]
+
+        def roll(ts_ns: int, value: Any):
+            if type(value) not in _NUMERIC:
+                return
+            finest = state[0]
+            if finest is None:
+                finest = state[0] = self._attr_tiers(attr)[0]
+            o = finest.open
+            if o is not None and o[0] <= ts_ns < o[0] + finest.bucket_ns:
+                # fast path, same as _Tier.add for a sample in the open bucket
+                if value < o[1]:
+                    o[1] = value
+                if value > o[2]:
+                    o[2] = value
+                o[3] += value
+                o[4] += 1
+                o[5] = value
+                return
+            finest.add(ts_ns, value, value, value, 1, value)
+
+        return roll
+
+    def query(self, attr: str, since: datetime, until: datetime = None, points: int = 1000) -> Optional[np.ndarray]:
+        """
+        BUCKET array from the coarsest tier that still gives `points` buckets
+        over [since, until] (moving coarser if that tier doesn't reach back
+        to since), merged down to at most ~points buckets. None if even the
+        finest tier is too coarse, i.e. the raw samples should be used, or if
+        the attribute has no rollups.
+        """
+        tiers = self.store.get(attr)
+        if not tiers:
+            return None
+        since_ns = to_ns(since)
+        until_ns = to_ns(until or datetime.utcnow())
+        window = until_ns - since_ns
+        best = None
+        for i, tier in enumerate(tiers):
+            if window // tier.bucket_ns < points:
+                break
+            best = i
+        if best is None:
+            return None
+        while not tiers[best].reaches(since_ns) and best + 1 < len(tiers):
+            best += 1
+        tier = tiers[best]
+        buckets = tier.buckets(since_ns, until_ns)
+        per_point = -(-(window // tier.bucket_ns) // points)  # tier buckets per returned bucket
+        if per_point > 1:
+            buckets = merge_buckets(buckets, per_point * tier.bucket_ns)
+        return buckets
@@ -0,0 +1,54 @@
+# src/infrastructure/seqlock.py
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# optimistic attempts before a reader falls back (or gives up), and the pause
+# between them: a real sleep, so the GIL goes to the writer to finish its update
+_MAX_ATTEMPTS = 1000
+_BACKOFF_SECONDS = 5e-5
+
+
+class SeqLock:
+    """
+    Sequence counter guarding one history series, written by a single
+    thread (the asyncio ingest loop) and read from others (Bokeh sessions).
+
+    The writer never waits: it makes `seq` odd before touching the series
+    and even again when done (begin()/end(), or `with seqlock:`). A reader
+    runs a short, side-effect-free read and keeps it only if no write
+    started or finished meanwhile; otherwise (or if the structure changed
+    under it and raised) it retries. Readers should only capture a cheap
+    snapshot here and do the heavy work on it afterwards, so retries stay
+    rare.
+    """
+
+    __slots__ = ("seq",)
+
+    def __init__(self):
+        self.seq = 0
+
+    def __enter__(self):
+        self.seq += 1
+
+    def __exit__(self, *exc):
+        self.seq += 1
+
+    def read(self, fn: Callable[[], T], fallback: Optional[Callable[[], T]] = None) -> T:
+        """fn() as of a point with no write in progress; fallback() after too many collisions."""
+        for _ in range(_MAX_ATTEMPTS):
+            seq = self.seq
+            if not seq & 1:
+                try:
+                    result = fn()
+                except (RuntimeError, IndexError, ValueError):
+                    # e.g. "deque mutated during iteration", or a buffer resized mid-read
+                    pass
+                else:
+                    if self.seq == seq:
+                        return result
+            time.sleep(_BACKOFF_SECONDS)
+        if fallback is not None:
+            return fallback()
+        raise RuntimeError("history series kept changing during the read")
@@ -1,19 +1,214 @@
 # src/presentation/bokeh_app.py
 import datetime
+import time
+import warnings
+import numpy as np
+from bokeh.events import RangesUpdate, Reset
 from bokeh.layouts import column
-from bokeh.models import MultiChoice, ColumnDataSource, Slider, Legend, LegendItem
+from bokeh.models import MultiChoice, ColumnDataSource, Slider, Legend, LegendItem, Select, LinearColorMapper, ColorBar
 from bokeh.plotting import figure
-from bokeh.palettes import Category10
+from bokeh.palettes import Category10, Viridis256
+
+from infrastructure.epoch import EPOCH, to_ns
+from presentation.render_cache import LATEST, RenderCache, render_line
 
 MAX_LINES = 10 
 
-def make_bokeh_app(doc, history_repo, attrs: list):
+
+def _reduce_bins(profiles: np.ndarray, factor: int) -> np.ndarray:
+    """(n, bins) -> (n, ceil(bins / factor)): mean of each group of `factor` range bins, NaN-aware."""
+    if factor == 1:
+        return profiles
+    n, bins = profiles.shape
+    rows = -(-bins // factor)
+    padded = np.full((n, rows * factor), np.nan, dtype=np.float32)
+    padded[:, :bins] = profiles
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN groups stay NaN
+        return np.nanmean(padded.reshape(n, rows, factor), axis=2).astype(np.float32)
+
+
+class ProfileImage:
+    """
+    Range-time heatmap of one profile-valued attribute, drawn by a single
+    `image` glyph. The rolling float32 buffer (range rows x time columns,
+    NaN = no data) is split into tiles of TILE columns, one image per row
+    of `source`, aligned to absolute time so they never move.
+
+    A full redraw rebuilds the tiles from the history window. Afterwards
+    each new profile only patches its column (averaged into its time
+    slot), and when time moves past the last tile a blank one is streamed
+    in with rollover dropping the oldest, so the image is never resent
+    whole. Long windows get wider time slots (at most MAX_COLUMNS) and
+    profiles longer than MAX_ROWS bins are averaged down on the server.
+    """
+
+    TILE = 64
+    MAX_COLUMNS = 960
+    MAX_ROWS = 512
+    MIN_SLOT_SECONDS = 1.0
+
+    def __init__(self, source: ColumnDataSource):
+        self.source = source
+        self.attr = None
+        self.cursor = 0
+        self.bins = None      # range bins of the profiles drawn (a different length forces a redraw)
+        self.factor = 1       # range bins averaged per image row
+        self.slot_ns = 0      # time column width
+        self.tiles = []       # first slot of each tile, in source row order
+        self.counts = []      # per tile: profiles averaged into each column
+        self.max_tiles = 0
+
+    def _profiles(self, items) -> tuple:
+        """(timestamps in epoch ns, (n, bins) float32) of the array-valued samples with the expected length."""
+        ts, rows = [], []
+        for t, value in items:
+            arr = np.asarray(value, dtype=np.float32) if isinstance(value, (list, tuple, np.ndarray)) else None
+            if arr is None or arr.ndim != 1 or len(arr) != self.bins:
+                continue
+            ts.append(to_ns(t))
+            rows.append(arr)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.bins or 0), dtype=np.float32)
+        return np.array(ts, dtype=np.int64), _reduce_bins(np.stack(rows), self.factor)
+
+    def _blank_tile(self, first_slot: int) -> dict:
+        rows = -(-self.bins // self.factor)
+        return dict(image=[np.full((rows, self.TILE), np.nan, dtype=np.float32)],
+                    x=[first_slot * self.slot_ns // 1_000_000], y=[0],
+                    dw=[self.TILE * self.slot_ns // 1_000_000], dh=[self.bins])
+
+    def redraw(self, history_repo, attr: str, minutes: int):
+        """Rebuilds the whole image from the last `minutes` of attr."""
+        self.attr = attr
+        _, self.cursor = history_repo.read_since(attr, LATEST)
+        since = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes)
+        ts, values = history_repo.get_arrays(attr, since=since, copy=True)
+        if values.ndim == 2:
+            # profile storage: already (n, bins), no per-sample conversion
+            newest = values[-1] if len(values) else None
+        else:
+            items = history_repo.get_history(attr, since=since)
+            newest = next((v for _, v in reversed(items) if isinstance(v, (list, tuple, np.ndarray))), None)
+        if newest is None or len(newest) == 0:
+            self.bins, self.tiles, self.counts = None, [], []
+            self.source.data = dict(image=[], x=[], y=[], dw=[], dh=[])
+            return
+        self.bins = len(newest)
+        self.factor = -(-self.bins // self.MAX_ROWS)
+        slot_s = max(self.MIN_SLOT_SECONDS, minutes * 60 / self.MAX_COLUMNS)
+        self.slot_ns = int(slot_s * 1e9)
+        self.max_tiles = -(-int(minutes * 60 / slot_s) // self.TILE) + 1
+
+        now_slot = to_ns(datetime.datetime.utcnow()) // self.slot_ns
+        last_tile = now_slot // self.TILE
+        first_tile = last_tile - self.max_tiles + 1
+        origin = first_tile * self.TILE  # first slot drawn
+        n_slots = self.max_tiles * self.TILE
+        if values.ndim == 2:
+            profiles = _reduce_bins(values.astype(np.float32, copy=False), self.factor)
+        else:
+            ts, profiles = self._profiles(items)
+        slots = ts // self.slot_ns - origin
+        keep = (slots >= 0) & (slots < n_slots)
+        slots, profiles = slots[keep], profiles[keep]
+
+        # average the profiles falling in the same time slot (NaN bins don't count)
+        if len(slots) > 1 and np.any(slots[1:] < slots[:-1]):
+            order = np.argsort(slots, kind="stable")
+            slots, profiles = slots[order], profiles[order]
+        image = np.full((profiles.shape[1], n_slots), np.nan, dtype=np.float32)  # rows x slots
+        counts = np.zeros(n_slots, dtype=np.int64)
+        if len(slots):
+            starts = np.flatnonzero(np.r_[True, slots[1:] != slots[:-1]])
+            valid = ~np.isnan(profiles)
+            sums = np.add.reduceat(np.where(valid, profiles, 0), starts, axis=0)
+            hits = np.add.reduceat(valid.astype(np.int32), starts, axis=0)
+            with np.errstate(invalid="ignore"):
+                image[:, slots[starts]] = (sums / hits).T
+            counts[slots[starts]] = np.diff(np.r_[starts, len(slots)])
+
+        self.tiles = [origin + k * self.TILE for k in range(self.max_tiles)]
+        self.counts = [counts[k * self.TILE:(k + 1) * self.TILE].copy() for k in range(self.max_tiles)]
+        data = dict(image=[], x=[], y=[], dw=[], dh=[])
+        for k, first_slot in enumerate(self.tiles):
+            tile = self._blank_tile(first_slot)
+            tile["image"] = [np.ascontiguousarray(image[:, k * self.TILE:(k + 1) * self.TILE])]
+            for key, value in tile.items():
+                data[key] += value
+        self.source.data = data
+
+    def stream_new(self, history_repo) -> bool:
+        """
+        Adds the profiles that arrived since the last call, patching only
+        their columns; False if the image needs a redraw instead (new
+        profile length).
+        """
+        items, self.cursor = history_repo.read_since(self.attr, self.cursor)
+        if not items:
+            return True
+        if self.bins is None or any(isinstance(v, (list, tuple, np.ndarray)) and len(v) != self.bins
+                                    for _, v in items):
+            return False
+        ts, profiles = self._profiles(items)
+        changed = set()  # (first slot of the tile, column)
+        for t, profile in zip(ts.tolist(), profiles):
+            slot = t // self.slot_ns
+            first_slot = slot - slot % self.TILE
+            while first_slot > self.tiles[-1]:
+                # time moved past the last tile: stream a blank one in, dropping the oldest
+                tile = self.tiles[-1] + self.TILE
+                self.source.stream(self._blank_tile(tile), rollover=self.max_tiles)
+                self.tiles.append(tile)
+                self.counts.append(np.zeros(self.TILE, dtype=np.int64))
+                if len(self.tiles) > self.max_tiles:
+                    del self.tiles[0], self.counts[0]
+            if first_slot < self.tiles[0]:
+                continue  # older than the image
+            row = (first_slot - self.tiles[0]) // self.TILE
+            col = slot - first_slot
+            image = self.source.data["image"][row]
+            n = self.counts[row][col]
+            # running mean of the slot; bins that were NaN take the new value
+            column = image[:, col]
+            image[:, col] = np.where(np.isnan(column), profile,
+                                     np.where(np.isnan(profile), column, (column * n + profile) / (n + 1)))
+            self.counts[row][col] = n + 1
+            changed.add((first_slot, col))
+        # send only the changed columns (the buffer itself was updated in place above)
+        patches = []
+        for first_slot, col in sorted(changed):
+            row = (first_slot - self.tiles[0]) // self.TILE
+            if row >= 0:
+                patches.append(([row, slice(None), col], self.source.data["image"][row][:, col].copy()))
+        if patches:
+            self.source.patch(dict(image=patches))
+        return True
+
+
+def make_bokeh_app(doc, history_repo, attrs: list, decimation: str = "minmax",
+                   render_cache: RenderCache = None, min_frame_interval: float = 0.1,
+                   profile_attrs: list = ()):
+    """
+    decimation: "minmax" (keeps every spike) or "lttb" (closest shape), see presentation.decimation.
+    render_cache: shared by all sessions of a server, so each line is decimated once per tick.
+    min_frame_interval: the plot is redrawn when a selected variable gets new samples
+    (history_repo.changes), at most once per this many seconds.
+    profile_attrs: array-valued (per range bin) variables, shown as a range-time heatmap.
+    """
     if not attrs:
         attrs = ["heartbeat"]
+    if render_cache is None:
+        render_cache = RenderCache(history_repo)
 
-    minutes = Slider(start=1, end=60, value=10, step=1, title="Time window")
+    # windows past the raw retention are served from the history rollup tiers
+    minutes = Slider(start=1, end=24 * 60, value=10, step=1, title="Time window (minutes)")
 
     MAX_POINTS = 1800
+    # lines with up to this many samples in the window are streamed, longer ones redrawn
+    MAX_STREAM_POINTS = 20_000
+    # quiet time after the last pan/zoom before the visible interval is re-queried
+    ZOOM_DEBOUNCE_SECONDS = 0.3
 
     multi_select = MultiChoice(
         title="Select Variables", 
@@ -30,6 +225,24 @@ def make_bokeh_app(doc, history_repo, attrs: list):
         tools="pan,wheel_zoom,box_zoom,reset,save"
     )
     
+    # Range-time heatmap of one profile variable (only if there are any)
+    profile_select = profile_fig = profile_view = None
+    if profile_attrs:
+        profile_select = Select(title="Profile variable", value=profile_attrs[0], options=list(profile_attrs))
+        profile_fig = figure(
+            x_axis_type="datetime",
+            height=400,
+            title="Range-time profile",
+            sizing_mode="stretch_width",
+            tools="pan,wheel_zoom,box_zoom,reset,save",
+            y_axis_label="Range bin"
+        )
+        mapper = LinearColorMapper(palette=Viridis256, nan_color=(0, 0, 0, 0))
+        profile_source = ColumnDataSource(data=dict(image=[], x=[], y=[], dw=[], dh=[]))
+        profile_fig.image(image='image', x='x', y='y', dw='dw', dh='dh', source=profile_source, color_mapper=mapper)
+        profile_fig.add_layout(ColorBar(color_mapper=mapper), 'right')
+        profile_view = ProfileImage(profile_source)
+
     # --- 1. Create Pool of Sources, Lines and Points ---
     sources = []
     lines = []
@@ -41,6 +254,13 @@ def make_bokeh_app(doc, history_repo, attrs: list):
     hidden_by_user = set()
     # Flag to prevent callback from interfering during update()
     updating = False
+    # Per line: variable drawn, read_since cursor, stream rollover (None = redraw at next_refresh)
+    line_state = [dict(attr=None, cursor=0, rollover=None, next_refresh=0.0, last_ts=None, bucket_s=None)
+                  for _ in range(MAX_LINES)]
+    # Window and selection drawn last tick
+    view = dict(minutes=None, attrs=None)
+    # Interval (epoch ms) drawn after a pan/zoom, None = live window; the pending one is debounced
+    zoom = dict(range=None, pending=None, due=0.0, scheduled=False)
 
     for i in range(MAX_LINES):
         src = ColumnDataSource(data=dict(x=[], y=[]))
@@ -99,23 +319,6 @@ def make_bokeh_app(doc, history_repo, attrs: list):
     for line in lines:
         line.on_change('visible', on_legend_click)
 
-    def _decimate(xs, ys, limit):
-        """Decimation that maintains temporal order"""
-        n = len(xs)
-        if n <= limit:
-            return xs, ys
-        step = max(1, n // limit)
-        # Keep first and last point, and sample uniformly in the middle
-        indices = [0] + list(range(step, n - 1, step)) + [n - 1]
-        # Remove duplicates maintaining order
-        seen = set()
-        unique_indices = []
-        for idx in indices:
-            if idx not in seen:
-                seen.add(idx)
-                unique_indices.append(idx)
-        return [xs[i] for i in unique_indices], [ys[i] for i in unique_indices]
-
     def _convert_timestamp(ts):
         """Converts datetime to timestamp in milliseconds for Bokeh"""
         # If datetime is naive (no timezone), assume UTC
@@ -124,13 +327,119 @@ def make_bokeh_app(doc, history_repo, attrs: list):
             ts = ts.replace(tzinfo=datetime.timezone.utc)
         return int(ts.timestamp() * 1000)
 
+    def _refresh_line(i, attr_name, now, incremental=False):
+        """Full redraw of line i (shared with other sessions); decides whether it can be streamed afterwards."""
+        st = line_state[i]
+        rendered = render_cache.line(attr_name, minutes.value, MAX_POINTS, decimation)
+        bucket_s = st["bucket_s"]
+        # the shared line may be up to a tick old: samples after its cursor are streamed (and deduplicated) below
+        st.update(attr=attr_name, cursor=rendered.cursor, rollover=None, last_ts=rendered.last_ts,
+                  bucket_s=rendered.bucket_s)
+        if rendered.bucket_s is not None:
+            # rollup buckets: refreshed once per bucket, sending only the buckets that changed
+            st["next_refresh"] = now + rendered.bucket_s
+            if incremental and bucket_s == rendered.bucket_s and _update_buckets(i, rendered):
+                return
+        elif rendered.samples <= MAX_STREAM_POINTS:
+            # room for about twice the points the window holds at the current rate
+            st["rollover"] = 2 * max(rendered.samples, MAX_POINTS)
+        else:
+            st["next_refresh"] = now + 1.0
+
+        # Update source data (own lists: stream() extends them in place)
+        sources[i].data = dict(x=rendered.xs.tolist(), y=rendered.ys.tolist())
+        if st["rollover"] is not None:
+            _stream_line(i, attr_name)
+
+    def _update_buckets(i, rendered):
+        """
+        Brings a rollup line (a min and a max point per bucket, buckets aligned
+        to absolute time) up to date by patching its last bucket and streaming
+        the newer ones; False if the drawn line doesn't line up with rendered.
+        """
+        xs = sources[i].data["x"]
+        if len(xs) < 2:
+            return False
+        last = xs[-1]
+        k = int(np.searchsorted(rendered.xs, last, side="left"))
+        if k + 2 > len(rendered.xs) or rendered.xs[k] != last or rendered.xs[k + 1] != last:
+            return False
+        n = len(xs)
+        sources[i].patch(dict(y=[(slice(n - 2, n), rendered.ys[k:k + 2].tolist())]))
+        if k + 2 < len(rendered.xs):
+            sources[i].stream(dict(x=rendered.xs[k + 2:].tolist(), y=rendered.ys[k + 2:].tolist()),
+                              rollover=len(rendered.xs))
+        return True
+
+    def _needs_refresh(i, window_start_ms, now):
+        st = line_state[i]
+        if st["rollover"] is None:
+            return now >= st["next_refresh"]
+        xs = sources[i].data["x"]
+        if not xs:
+            return False
+        slack = minutes.value * 60_000 / 10
+        # old points left in view (rate went down) or rollover cut into the window (rate went up)
+        return xs[0] < window_start_ms - slack or (len(xs) >= st["rollover"] and xs[0] > window_start_ms + slack)
+
+    def _stream_line(i, attr_name):
+        """Appends only the samples that arrived since the last tick."""
+        st = line_state[i]
+        items, st["cursor"] = history_repo.read_since(attr_name, st["cursor"])
+        if not items:
+            return
+        last = st["last_ts"]
+        new_x, new_y = [], []
+        for ts, val in items:
+            # skips what the last full redraw already had (and out-of-order samples)
+            if last is None or ts > last:
+                new_x.append(_convert_timestamp(ts))
+                new_y.append(val)
+                last = ts
+        st["last_ts"] = last
+        if new_x:
+            sources[i].stream(dict(x=new_x, y=new_y), rollover=st["rollover"])
+
     def update():
         nonlocal updating
         try:
             updating = True  # Disable callbacks during update
             
-            history_repo.set_retention(minutes.value)
-            selected_attrs = multi_select.value
+            # the slider is a view window only: retention is owned by the repo
+            window_start = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes.value)
+            window_start_ms = _convert_timestamp(window_start)
+            now = time.monotonic()
+            selected_attrs = list(multi_select.value)
+            window_changed = minutes.value != view["minutes"]
+            selection_changed = selected_attrs != view["attrs"]
+            view.update(minutes=minutes.value, attrs=selected_attrs)
+            watch = selected_attrs[:MAX_LINES] + ([profile_select.value] if profile_view else [])
+            if watched.symmetric_difference(watch):
+                _watch(watch)
+            
+            if zoom["range"] is not None:
+                # zoomed in: lines keep the zoomed interval until Reset
+                if selection_changed:
+                    _draw_zoom()
+            else:
+                # Lines are redrawn in full only when their variable or the window changes
+                # (or streaming can't keep the window right); otherwise new points are streamed
+                for i, attr_name in enumerate(selected_attrs[:MAX_LINES]):
+                    if window_changed or line_state[i]["attr"] != attr_name:
+                        _refresh_line(i, attr_name, now)
+                    elif _needs_refresh(i, window_start_ms, now):
+                        _refresh_line(i, attr_name, now, incremental=True)
+                    elif line_state[i]["rollover"] is not None:
+                        _stream_line(i, attr_name)
+
+            # Heatmap: new profiles patch their column; redrawn on a new variable, window or profile length
+            if profile_view is not None:
+                profile_attr = profile_select.value
+                if window_changed or profile_view.attr != profile_attr or not profile_view.stream_new(history_repo):
+                    profile_view.redraw(history_repo, profile_attr, minutes.value)
+
+            if not selection_changed:
+                return
             
             # Keep only hidden variables that are still selected
             # (if a variable is deselected, it doesn't need to be in hidden_by_user)
@@ -147,21 +456,6 @@ def make_bokeh_app(doc, history_repo, attrs: list):
                 if i >= MAX_LINES:
                     break
                 
-                data = history_repo.get_history(attr_name)
-                
-                # Sort by timestamp to ensure chronological order
-                data = sorted(data, key=lambda x: x[0])
-    
-                # Convert timestamps and values, maintaining order
-                xs = [_convert_timestamp(ts) for ts, _ in data]
-                ys = [val for _, val in data]
-                
-                # Decimate maintaining temporal order
-                xs, ys = _decimate(xs, ys, MAX_POINTS)
-    
-                # Update source data
-                sources[i].data = dict(x=xs, y=ys)
-                
                 # Register mapping before changing visibility
                 line_to_attr[i] = attr_name
                 
@@ -183,7 +477,9 @@ def make_bokeh_app(doc, history_repo, attrs: list):
     
             # Hide and clean unused lines and points
             for i in range(len(selected_attrs), MAX_LINES):
-                sources[i].data = dict(x=[], y=[])
+                if line_state[i]["attr"] is not None:
+                    sources[i].data = dict(x=[], y=[])
+                    line_state[i]["attr"] = None
                 lines[i].visible = False
                 points[i].visible = False
                 if i in line_to_attr:
@@ -209,8 +505,101 @@ def make_bokeh_app(doc, history_repo, attrs: list):
         multi_select, 
         p,
         minutes,
+        *([profile_select, profile_fig] if profile_view else []),
         sizing_mode="stretch_width"
     )
 
     doc.add_root(layout)
-    doc.add_periodic_callback(update, 1000)
\ No newline at end of file
+
+    # --- 3. Push-driven refresh: a frame only when a selected variable has new samples ---
+    feed = history_repo.changes
+    watched = set()
+    frame = dict(pending=False, last=0.0)
+
+    def request_frame(attr_name=None):
+        """Schedules one update (coalesced); safe from any thread, e.g. the ingest loop via the feed."""
+        if not frame["pending"]:
+            frame["pending"] = True
+            doc.add_next_tick_callback(_frame)
+
+    def _frame():
+        wait = frame["last"] + min_frame_interval - time.monotonic()
+        if wait > 0:
+            doc.add_timeout_callback(_draw, wait * 1000)
+        else:
+            _draw()
+
+    def _draw():
+        # cleared first: samples arriving during update() request the next frame
+        frame["pending"] = False
+        frame["last"] = time.monotonic()
+        update()
+
+    def _watch(selected):
+        for attr_name in watched.difference(selected):
+            feed.unsubscribe(attr_name, request_frame)
+        for attr_name in set(selected).difference(watched):
+            feed.subscribe(attr_name, request_frame)
+        watched.clear()
+        watched.update(selected)
+
+    def on_view_change(attr, old, new):
+        request_frame()
+
+    # --- 4. Zoom-aware re-decimation: pan/zoom re-queries the visible interval ---
+    def _draw_zoom():
+        """Redraws every selected line over the zoomed interval, at about two points per pixel column."""
+        x0, x1 = zoom["range"]
+        since = EPOCH + datetime.timedelta(milliseconds=x0)
+        until = EPOCH + datetime.timedelta(milliseconds=x1)
+        try:
+            points = 2 * p.inner_width  # plot area width in pixels, reported by the browser
+        except ValueError:  # not reported yet
+            points = MAX_POINTS
+        for i, attr_name in enumerate(view["attrs"][:MAX_LINES]):
+            rendered = render_line(history_repo, attr_name, since, until, points, decimation)
+            sources[i].data = dict(x=rendered.xs.tolist(), y=rendered.ys.tolist())
+            line_state[i]["attr"] = attr_name
+
+    def _apply_zoom():
+        wait = zoom["due"] - time.monotonic()
+        if wait > 0:
+            doc.add_timeout_callback(_apply_zoom, wait * 1000)
+            return
+        zoom["scheduled"] = False
+        if zoom["pending"] is None:  # cancelled by Reset
+            return
+        zoom["range"], zoom["pending"] = zoom["pending"], None
+        try:
+            _draw_zoom()
+        except Exception as e:
+            print(f"[bokeh zoom] {e}")
+
+    def on_ranges_update(event):
+        # sent by the browser after user pan/zoom/reset only (not when auto-ranging follows new data)
+        if event.x0 is None or event.x1 is None:
+            return
+        zoom["pending"] = (event.x0, event.x1)
+        zoom["due"] = time.monotonic() + ZOOM_DEBOUNCE_SECONDS
+        if not zoom["scheduled"]:
+            zoom["scheduled"] = True
+            doc.add_timeout_callback(_apply_zoom, ZOOM_DEBOUNCE_SECONDS * 1000)
+
+    def on_reset(event):
+        # back to the live window: full redraw of every line on the next frame
+        zoom["pending"] = None
+        if zoom["range"] is not None:
+            zoom["range"] = None
+            for st in line_state:
+                st["attr"] = None
+            request_frame()
+
+    p.on_event(RangesUpdate, on_ranges_update)
+    p.on_event(Reset, on_reset)
+
+    multi_select.on_change('value', on_view_change)
+    minutes.on_change('value', on_view_change)
+    if profile_select is not None:
+        profile_select.on_change('value', on_view_change)
+    doc.on_session_destroyed(lambda session_context: _watch([]))
+    request_frame()
\ No newline at end of file
@@ -0,0 +1,73 @@
+# src/presentation/decimation.py
+import numpy as np
+
+# algorithms accepted by downsample()
+METHODS = ("minmax", "lttb")
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the min and max sample of each of n_out // 2 equal-width x
+    buckets (one per pixel column), plus the first and last sample, in
+    order. Spikes and dropouts always survive. O(n), no Python loop.
+    """
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(1, n_out // 2)
+    yf = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(x[0], x[-1], n_buckets + 1)
+    bucket = np.searchsorted(edges[1:-1], x, side="right")  # non-decreasing, as x is sorted
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    bucket_of = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    picked = [np.array([0, n - 1])]
+    for reduce in (np.fmin, np.fmax):
+        extreme = reduce.reduceat(yf, starts)[bucket_of]
+        hits = np.flatnonzero(yf == extreme)  # all-NaN buckets have no hit
+        # first hit of each bucket
+        picked.append(hits[np.r_[True, bucket_of[hits[1:]] != bucket_of[hits[:-1]]]])
+    return np.unique(np.concatenate(picked))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices picked by Largest-Triangle-Three-Buckets (visually closest
+    polyline with n_out points). Long inputs are first reduced with minmax
+    to 4 * n_out candidates, so the per-bucket loop stays short; each
+    bucket's areas are computed vectorized.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    base = np.arange(n)
+    if n > 4 * n_out:
+        base = minmax(x, y, 4 * n_out)
+        n = len(base)
+        if n <= n_out:
+            return base
+    xf = np.asarray(x, dtype=np.float64)[base]
+    yf = np.asarray(y, dtype=np.float64)[base]
+    # bucket edges over the inner points; first and last points are fixed
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    means_x = np.add.reduceat(xf[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    means_y = np.add.reduceat(yf[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # next bucket's centroid (the last point for the last bucket)
+        cx, cy = (means_x[b + 1], means_y[b + 1]) if b + 1 < n_out - 2 else (xf[-1], yf[-1])
+        area = np.abs((xf[a] - cx) * (yf[lo:hi] - yf[a]) - (xf[a] - xf[lo:hi]) * (cy - yf[a]))
+        a = lo + int(np.nanargmax(area)) if np.any(area == area) else lo
+        out[b + 1] = a
+    return base[out]
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "minmax") -> np.ndarray:
+    """Indices of at most ~n_out samples of (x, y), x sorted, with the given method."""
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    if method == "minmax":
+        return minmax(x, y, n_out)
+    raise ValueError(f"unknown decimation method {method!r}, expected one of {METHODS}")
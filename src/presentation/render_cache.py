@@ -0,0 +1,100 @@
+# src/presentation/render_cache.py
+import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from infrastructure.epoch import EPOCH
+from presentation.decimation import downsample
+
+LATEST = sys.maxsize  # read_since cursor past any sample: returns the current sequence number
+
+
+class RenderedLine(NamedTuple):
+    xs: np.ndarray            # epoch ms, ready for Bokeh
+    ys: np.ndarray
+    cursor: int               # read_since sequence number taken before the read
+    last_ts: Optional[datetime.datetime]  # newest raw sample drawn (None for rollups)
+    samples: int              # raw samples in the window (0 for rollups)
+    bucket_s: Optional[float]  # rollup bucket length, None for raw lines
+
+
+def render_line(history_repo, attr: str, since: datetime.datetime, until: Optional[datetime.datetime],
+                points: int, decimation: str = "minmax", cursor: int = 0) -> RenderedLine:
+    """attr between since and until (None = latest), decimated to about `points` points."""
+    # Long windows: one min and one max point per rollup bucket
+    buckets = history_repo.get_rollup(attr, since=since, until=until, points=points // 2)
+    if buckets is not None:
+        xs = (buckets["ts"] // 1_000_000).repeat(2)
+        ys = np.column_stack((buckets["min"], buckets["max"])).ravel()
+        # buckets are aligned to absolute time: the smallest step is their length
+        bucket_s = int(np.diff(buckets["ts"]).min()) / 1e9 if len(buckets) > 1 else 1.0
+        return RenderedLine(xs, ys, cursor, None, 0, bucket_s)
+
+    ts, values = history_repo.get_arrays(attr, since=since, until=until, copy=True)
+    # Sort by timestamp to ensure chronological order
+    if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+        order = np.argsort(ts, kind="stable")
+        ts, values = ts[order], values[order]
+
+    # Decimate maintaining temporal order and extremes (spikes, dropouts)
+    idx = downsample(ts, values, points, decimation)
+    last_ts = EPOCH + datetime.timedelta(microseconds=int(ts[-1]) // 1000) if len(ts) else None
+    return RenderedLine(ts[idx] // 1_000_000, values[idx], cursor, last_ts, len(ts), None)
+
+
+class RenderCache:
+    """
+    Decimated lines shared by all Bokeh sessions of one server, keyed by
+    (attribute, window, points, decimation, data version, time column),
+    LRU-evicted. The time column (window / points, at least one tick)
+    keeps quiet attributes from serving a window computed long ago.
+
+    The data version is the attribute's read_since sequence number, sampled
+    at most once per `tick` seconds: sessions refreshing within the same
+    tick get the same key, so a line is read and decimated once per data
+    change however many browsers show it. Entries are never mutated; each
+    session converts the arrays to its own lists.
+    """
+
+    def __init__(self, history_repo, max_entries: int = 256, tick: float = 1.0):
+        self.history_repo = history_repo
+        self.max_entries = max_entries
+        self.tick = tick
+        self.entries: "OrderedDict[tuple, RenderedLine]" = OrderedDict()
+        self._versions: Dict[str, Tuple[float, int]] = {}  # attr -> (sampled at, version)
+        self._lock = threading.Lock()
+
+    def version(self, attr: str) -> int:
+        now = time.monotonic()
+        seen = self._versions.get(attr)
+        if seen is not None and now - seen[0] < self.tick:
+            return seen[1]
+        _, version = self.history_repo.read_since(attr, LATEST)
+        self._versions[attr] = (now, version)
+        return version
+
+    def line(self, attr: str, minutes: int, points: int, decimation: str = "minmax") -> RenderedLine:
+        """The last `minutes` of attr, at most ~points points, computed once per data version."""
+        version = self.version(attr)
+        # the window moves even when the data doesn't: entries also expire after one pixel column of time
+        column = int(time.monotonic() // max(self.tick, minutes * 60 / max(1, points)))
+        key = (attr, minutes, points, decimation, version, column)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        # computed outside the lock: two sessions missing together just compute it twice
+        window_start = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes)
+        entry = render_line(self.history_repo, attr, window_start, None, points, decimation, version)
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
@@ -0,0 +1,151 @@
+# tests/test_history_concurrency.py
+"""
+One writer thread appending while several reader threads query the same
+attribute: reads must see samples in order, read_since must continue
+without gaps, and rollup buckets must match the samples they aggregate.
+Sample i has timestamp base + i ms and value i, so every check is exact.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from infrastructure.file_history_repo import FileHistoryRepo
+from infrastructure.memory_history_repo import MemoryHistoryRepo
+from infrastructure.numpy_history_repo import NumpyHistoryRepo
+
+BASE = datetime(2026, 1, 1)
+MS = timedelta(milliseconds=1)
+SECONDS = 1.0
+READERS = 3
+
+
+def _reader(repo, stop: threading.Event, errors: list, reads: list, spacing: timedelta, gap_free: bool):
+    def _index(ts: datetime) -> int:
+        return (ts - BASE) // spacing
+
+    seq, last = 0, -1
+    try:
+        while not stop.is_set():
+            history = repo.get_history("A", since=BASE + max(0, last - 5000) * spacing)
+            values = [v for _, v in history]
+            assert all(_index(t) == v for t, v in history), "timestamp/value mismatch"
+            assert values == sorted(set(values)), "history out of order"
+
+            items, next_seq = repo.read_since("A", seq)
+            assert next_seq >= seq
+            if gap_free and seq and items:
+                assert items[0][1] == last + 1, f"read_since gap: {last} -> {items[0][1]}"
+            assert all(_index(t) == v for t, v in items)
+            assert all(b[1] == a[1] + 1 for a, b in zip(items, items[1:])), "read_since not contiguous"
+            if items:
+                last = items[-1][1]
+            seq = next_seq
+
+            buckets = repo.get_rollup("A", since=BASE, until=BASE + timedelta(hours=1), points=10)
+            if buckets is not None:
+                for b in buckets:
+                    # consecutive values: a consistent bucket is exactly [min, max]
+                    assert b["count"] == b["max"] - b["min"] + 1, "torn rollup bucket"
+                    assert b["mean"] == pytest.approx((b["min"] + b["max"]) / 2)
+                    assert b["last"] == b["max"]
+            reads[0] += 1
+    except Exception as e:
+        errors.append(e)
+
+
+def _stress(repo, spacing: timedelta = MS, gap_free: bool = True):
+    stop = threading.Event()
+    errors, reads, written = [], [0], [0]
+
+    def writer():
+        append = repo.appender("A")
+        i = 0
+        while not stop.is_set():
+            ts = BASE + i * spacing
+            append(float(i), ts=ts, received=ts)
+            i += 1
+        written[0] = i
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=_reader, args=(repo, stop, errors, reads, spacing, gap_free)) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for t in threads:
+        t.join()
+    assert not errors, errors[0]
+    assert written[0] > 0 and reads[0] > 0
+    history = repo.get_history("A")
+    assert [v for _, v in history] == sorted(set(v for _, v in history))
+    if gap_free:
+        assert [v for _, v in history] == [float(i) for i in range(written[0] - len(history), written[0])]
+
+
+@pytest.mark.parametrize("make_repo", [
+    lambda: MemoryHistoryRepo(retention_minutes=600),
+    lambda: MemoryHistoryRepo(retention_minutes=600, compress=True, block_size=128),
+    lambda: NumpyHistoryRepo(retention_minutes=600, capacity=256),
+], ids=["memory", "compressed", "numpy"])
+def test_concurrent_reads_see_consistent_history(make_repo):
+    _stress(make_repo())
+
+
+def test_concurrent_reads_file_backend(tmp_path):
+    repo = FileHistoryRepo(str(tmp_path), flush_interval_seconds=0.01)
+    try:
+        _stress(repo)
+    finally:
+        repo.close()
+
+
+def test_concurrent_reads_file_backend_during_retention(tmp_path):
+    # samples 10 s apart: a new one-minute segment every 6 samples, and all but
+    # the newest are past retention, so the flusher deletes segments under the readers
+    repo = FileHistoryRepo(str(tmp_path), retention_minutes=1, segment_minutes=1, flush_interval_seconds=0.001)
+    try:
+        _stress(repo, spacing=timedelta(seconds=10), gap_free=False)
+    finally:
+        repo.close()
+
+
+def test_file_snapshot_between_write_and_flush_sees_each_sample_once(tmp_path):
+    repo = FileHistoryRepo(str(tmp_path), flush_interval_seconds=3600)
+    write = repo._write
+    seen = []
+
+    def write_then_read(a, records):
+        write(a, records)
+        # segment counts are published: the flushed records must not be read again from the buffer
+        seen.append([v for _, v in repo.get_history("A")])
+        seen.append([v for _, v in repo.read_since("A", 0)[0]])
+
+    repo._write = write_then_read
+    append = repo.appender("A")
+    for i in range(3):
+        append(float(i), ts=BASE + i * MS)
+    repo.close()
+    assert seen == [[0.0, 1.0, 2.0]] * 2
+
+
+def test_file_read_after_retention_deleted_a_snapshot_segment(tmp_path):
+    repo = FileHistoryRepo(str(tmp_path), retention_minutes=10**9, segment_minutes=1, flush_interval_seconds=3600)
+    append = repo.appender("A")
+    for i in range(18):  # three one-minute segments
+        append(float(i), ts=BASE + i * timedelta(seconds=10))
+    repo.flush()
+    repo.set_retention(1)
+    snapshot = repo._snapshot
+
+    def snapshot_then_expire(attr):
+        taken = snapshot(attr)
+        repo._apply_retention()  # the flush thread deletes the old segments under the reader
+        return taken
+
+    repo._snapshot = snapshot_then_expire
+    try:
+        assert [v for _, v in repo.get_history("A")] == [float(i) for i in range(12, 18)]
+    finally:
+        repo.close()